@@ -0,0 +1,65 @@
+"""Select the inputs affected by the changes in a git repository."""
+
+import os
+import subprocess  # nosec
+from collections.abc import Sequence
+
+from .shard import scan
+
+
+def _git(directory: str, *args: str) -> str:
+    """Run a local git command and return its output."""
+    return subprocess.run(  # nosec
+        ["git", "-C", directory, *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def changed_files(revision: str, directory: str = ".") -> set[str]:
+    """
+    List the files changed since a revision, as absolute paths.
+
+    Includes the changes committed since the revision, those not committed
+    yet, and the new files not tracked yet (unless ignored).
+    Raises subprocess.CalledProcessError if git fails.
+    """
+    top = _git(directory, "rev-parse", "--show-toplevel").strip()
+    names = _git(
+        directory, "diff", "--name-only", "--no-renames", "-z", revision, "--"
+    ).split("\0")
+    names += _git(
+        directory, "ls-files", "--others", "--exclude-standard", "-z", "--full-name"
+    ).split("\0")
+    return {os.path.realpath(os.path.join(top, name)) for name in names if name}
+
+
+def select_changed(inputs: Sequence[str], changed: set[str]) -> list[str]:
+    """
+    Select the inputs that changed, or reference a document that changed.
+
+    References are 'run:' and '$import's, followed transitively, resolved
+    relatively to the referencing document like the upgrade does.
+    The documents affected are found by walking the references backwards
+    from the changed documents, so reference cycles need no special care.
+    """
+    references: dict[str, list[str]] = {}
+    pending = [os.path.abspath(path) for path in inputs]
+    while pending:
+        path = pending.pop()
+        if path not in references:
+            references[path] = scan(path)[1]
+            pending.extend(references[path])
+    referrers: dict[str, list[str]] = {}
+    for path, targets in references.items():
+        for target in targets:
+            referrers.setdefault(target, []).append(path)
+    affected = {path for path in references if os.path.realpath(path) in changed}
+    pending = list(affected)
+    while pending:
+        for referrer in referrers.get(pending.pop(), []):
+            if referrer not in affected:
+                affected.add(referrer)
+                pending.append(referrer)
+    return [path for path in inputs if os.path.abspath(path) in affected]
@@ -0,0 +1,133 @@
+"""Rewrite draft-3 File 'path' references in CWL expressions to 'location'."""
+
+import functools
+import re
+
+_TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<comment>//[^\n]*|/\*.*?\*/)
+    | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'|`(?:[^`\\]|\\.)*`)
+    | (?P<name>[A-Za-z_$][\w$]*)
+    | (?P<number>\d[\w.]*)
+    | (?P<punct>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_CLOSING = {"(": ")", "[": "]", "{": "}"}
+
+
+def _tokenize(code: str, start: int, opening: str) -> tuple[list[tuple[str, str]], int]:
+    """
+    Tokenize a JavaScript expression body until its closing bracket.
+
+    Returns the (kind, text) tokens and the index of the closing bracket,
+    or len(code) if the expression is not terminated.
+    """
+    tokens: list[tuple[str, str]] = []
+    stack = [_CLOSING[opening]]
+    index = start
+    while index < len(code):
+        match = _TOKEN.match(code, index)
+        if match is None:
+            break
+        kind = match.lastgroup or "punct"
+        text = match[0]
+        if kind == "punct":
+            if text in _CLOSING:
+                stack.append(_CLOSING[text])
+            elif text == stack[-1]:
+                stack.pop()
+                if not stack:
+                    return tokens, index
+        tokens.append((kind, text))
+        index = match.end()
+    return tokens, len(code)
+
+
+def _is_root_inputs(tokens: list[tuple[str, str]], index: int) -> bool:
+    """Check if the token at index is a bare 'inputs', not a property access."""
+    if tokens[index] != ("name", "inputs"):
+        return False
+    previous = _previous(tokens, index)
+    return previous is None or tokens[previous][1] != "."
+
+
+def _previous(tokens: list[tuple[str, str]], index: int) -> int | None:
+    """Find the significant token before index."""
+    index -= 1
+    while index >= 0 and tokens[index][0] in ("space", "comment"):
+        index -= 1
+    return index if index >= 0 else None
+
+
+def _next(tokens: list[tuple[str, str]], index: int) -> int | None:
+    """Find the significant token after index."""
+    index += 1
+    while index < len(tokens) and tokens[index][0] in ("space", "comment"):
+        index += 1
+    return index if index < len(tokens) else None
+
+
+def _rewrite_tokens(tokens: list[tuple[str, str]]) -> str:
+    """
+    Replace File 'path' references with 'location'.
+
+    Handles property accesses (``self.path``), subscripts (``self["path"]``)
+    and object literal keys (``{"path": ...}``), but not string literals in any
+    other position, nor ``inputs.path`` (that refers to an input named path).
+    """
+    result = [text for _, text in tokens]
+    for index, (kind, text) in enumerate(tokens):
+        if kind == "name" and text == "path":
+            previous = _previous(tokens, index)
+            if previous is not None and tokens[previous][1] == ".":
+                owner = _previous(tokens, previous)
+                if owner is None or not _is_root_inputs(tokens, owner):
+                    result[index] = "location"
+                continue
+        if kind not in ("name", "string") or text.strip("\"'") != "path":
+            continue
+        if kind == "string" and text[0] == "`":
+            continue
+        previous = _previous(tokens, index)
+        following = _next(tokens, index)
+        if previous is None or following is None:
+            continue
+        replacement = "location" if kind == "name" else f"{text[0]}location{text[0]}"
+        if tokens[previous][1] in ("{", ",") and tokens[following][1] == ":":
+            result[index] = replacement
+        elif (
+            kind == "string"
+            and tokens[previous][1] == "["
+            and tokens[following][1] == "]"
+        ):
+            owner = _previous(tokens, previous)
+            if owner is None or not _is_root_inputs(tokens, owner):
+                result[index] = replacement
+    return "".join(result)
+
+
+@functools.lru_cache(maxsize=4096)
+def rewrite_path_to_location(text: str) -> str:
+    """
+    Rewrite the File 'path' references in all the expressions of a string.
+
+    Both parameter references ``$(...)`` and code blocks ``${...}`` are
+    rewritten; text outside of expressions and escaped ``\\$(`` are kept.
+    Results are memoized, as the same expressions repeat across documents.
+    """
+    if "path" not in text:
+        return text
+    output = []
+    index = 0
+    for match in re.finditer(r"(?<!\\)\$([({])", text):
+        if match.start() < index:
+            continue
+        tokens, end = _tokenize(text, match.end(), match[1])
+        output.append(text[index : match.end()])
+        output.append(_rewrite_tokens(tokens))
+        index = end
+    output.append(text[index:])
+    return "".join(output)
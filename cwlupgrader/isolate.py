@@ -0,0 +1,224 @@
+"""Upgrade each document in a supervised worker process, with resource limits."""
+
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import signal
+from collections import deque
+from collections.abc import Sequence
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any, cast
+
+from .memory import MEGABYTE
+from .progress import Progress
+from .shard import group_inputs, resolve_reference
+
+if TYPE_CHECKING:
+    from .main import Upgrader
+
+_REFERENCE = re.compile(r"""(?:run|\$import)["']?[ \t]*:[ \t]*["']?([^\s"'{}\[\],]+)""")
+
+_SIGNALS = {
+    signal.SIGXCPU: "CPU time limit exceeded",
+    signal.SIGABRT: "aborted",
+    signal.SIGKILL: "killed",
+}
+
+
+def quick_scan(path: str) -> tuple[int, list[str]]:
+    """
+    Find the files a document may reference, without parsing it.
+
+    Unlike scan(), the text is only searched for what looks like 'run:' and
+    '$import' references, in block, flow or JSON style, so that the
+    supervisor is not stalled by the documents it should isolate. This can
+    find too many references, which only costs some parallelism.
+    The cost is the size of the file.
+    """
+    try:
+        with open(path) as handle:
+            text = handle.read()
+    except (OSError, UnicodeDecodeError):
+        return 0, []
+    base = os.path.dirname(path)
+    references = (resolve_reference(value, base) for value in _REFERENCE.findall(text))
+    return len(text), [reference for reference in references if reference is not None]
+
+
+def _address_space() -> int:
+    """The virtual memory size of this process in bytes, 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _limit(cpu_limit: int | None, memory_limit: int | None) -> None:
+    """Limit the CPU time and the memory of this process."""
+    if cpu_limit is not None:
+        # SIGXCPU at the soft limit, SIGKILL a second later if it is ignored
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+    if memory_limit is not None:
+        # RLIMIT_RSS isn't enforced by Linux, the address space is
+        limit = _address_space() + memory_limit * MEGABYTE
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def describe_exit(exitcode: int | None) -> str:
+    """Explain why a worker process stopped without a result."""
+    if exitcode is not None and exitcode < 0:
+        try:
+            number = signal.Signals(-exitcode)
+        except ValueError:
+            return f"killed by signal {-exitcode}"
+        return f"{_SIGNALS.get(number, 'killed')} ({number.name})"
+    return f"worker exited with status {exitcode}"
+
+
+class Supervisor:
+    """
+    Upgrade every document in its own forked worker, a few at a time.
+
+    Each worker inherits the configuration of the Upgrader, is limited to
+    cpu_limit seconds of CPU time and memory_limit MiB of memory on top of
+    what it inherits, and reports what it wrote and validated back to the
+    Upgrader. A document that fails, exceeds a limit or crashes its worker
+    is recorded in failures, and the other documents carry on.
+    Documents that would write the same output file (see group_inputs()) are
+    never upgraded at the same time. Outputs must be written by the workers'
+    sink, to disk or to a store.
+    """
+
+    def __init__(
+        self,
+        upgrader: "Upgrader",
+        jobs: int = 1,
+        cpu_limit: int | None = None,
+        memory_limit: int | None = None,
+        logger: logging.Logger | None = None,
+        progress: Progress | None = None,
+    ) -> None:
+        """Configure the workers, and optionally report their progress."""
+        self.upgrader = upgrader
+        self.jobs = max(jobs, 1)
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.logger = logger if logger is not None else upgrader.logger
+        self.progress = progress
+        self.failures: dict[str, str] = {}
+        self._context = multiprocessing.get_context("fork")
+
+    def _work(self, connection: Connection, path: str) -> None:
+        """Upgrade a single document, in the worker process."""
+        _limit(self.cpu_limit, self.memory_limit)
+        upgrader = self.upgrader
+        written = len(upgrader.written)
+        report = upgrader.report
+        valid = len(report.valid) if report is not None else 0
+        invalid = set(report.invalid) if report is not None else set()
+        hits = upgrader.store.hits if upgrader.store is not None else 0
+        error = None
+        try:
+            upgrader.upgrade_file(path)
+        except MemoryError:
+            error = "memory limit exceeded"
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+        connection.send(
+            {
+                "error": error,
+                "written": upgrader.written[written:],
+                "valid": report.valid[valid:] if report is not None else [],
+                "invalid": (
+                    {
+                        source: message
+                        for source, message in report.invalid.items()
+                        if source not in invalid
+                    }
+                    if report is not None
+                    else {}
+                ),
+                "store_hits": (
+                    upgrader.store.hits - hits if upgrader.store is not None else 0
+                ),
+            }
+        )
+        connection.close()
+
+    def _collect(self, path: str, result: dict[str, Any]) -> None:
+        """Merge the result of a worker into the Upgrader."""
+        upgrader = self.upgrader
+        upgrader.written.extend(result["written"])
+        if upgrader.report is not None:
+            upgrader.report.valid.extend(result["valid"])
+            upgrader.report.invalid.update(result["invalid"])
+        if upgrader.store is not None:
+            upgrader.store.hits += result["store_hits"]
+        if result["error"] is not None:
+            self._fail(path, result["error"])
+
+    def _fail(self, path: str, reason: str) -> None:
+        self.logger.error("Failed to upgrade %s: %s", path, reason)
+        self.failures[path] = reason
+
+    def _start(self, path: str) -> tuple[Connection, BaseProcess]:
+        """Start a worker upgrading a document."""
+        if self.progress is not None:
+            self.progress.start(path)
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=self._work, args=(writer, path), daemon=True
+        )
+        process.start()
+        writer.close()
+        return reader, process
+
+    def _finish(self, reader: Connection, process: BaseProcess, path: str) -> None:
+        """Collect the result of a worker that finished or died."""
+        try:
+            result = reader.recv()
+        except EOFError:  # the worker died without a result
+            result = None
+        reader.close()
+        process.join()
+        failures = len(self.failures)
+        if result is not None:
+            self._collect(path, result)
+        else:
+            self._fail(path, describe_exit(process.exitcode))
+        if self.progress is not None:
+            self.progress.finish(path, len(self.failures) > failures)
+
+    def run(self, inputs: Sequence[str]) -> None:
+        """Upgrade all the inputs, the largest groups of documents first."""
+        queues = [deque(group) for _, group in group_inputs(inputs, quick_scan)]
+        running: dict[Connection, tuple[BaseProcess, str, deque[str]]] = {}
+        busy: set[int] = set()
+        while queues or running:
+            for queue in list(queues):
+                if len(running) >= self.jobs:
+                    break
+                if id(queue) in busy:
+                    continue
+                path = queue.popleft()
+                if not queue:
+                    queues.remove(queue)
+                reader, process = self._start(path)
+                running[reader] = (process, path, queue)
+                busy.add(id(queue))
+            for reader in cast(list[Connection], wait(list(running))):
+                process, path, queue = running.pop(reader)
+                busy.discard(id(queue))
+                self._finish(reader, process, path)
+
+    def log_summary(self) -> None:
+        """Log the number of failed documents, and which ones."""
+        if not self.failures:
+            return
+        self.logger.error("Failed to upgrade %d document(s):", len(self.failures))
+        for path, reason in self.failures.items():
+            self.logger.error("  %s: %s", path, reason)
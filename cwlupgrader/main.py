@@ -3,28 +3,66 @@
 
 import argparse
 import copy
+import io
+import json
 import logging
 import os
 import os.path
-import stat
+import re
+import subprocess  # nosec
 import sys
-from collections.abc import Callable, MutableMapping, MutableSequence, Sequence
+from collections.abc import (
+    Callable,
+    Iterator,
+    MutableMapping,
+    MutableSequence,
+    Sequence,
+)
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
 from pathlib import Path
 from typing import Any, Optional, Union
 
 import ruamel.yaml
-from ruamel.yaml.comments import CommentedMap  # for consistent sort order
+from ruamel.yaml.comments import (  # for consistent sort order
+    CommentedMap,
+    CommentedSeq,
+)
 from schema_salad.sourceline import SourceLine, add_lc_filename, cmap
 
+from .changes import changed_files, select_changed
+from .expressions import rewrite_path_to_location
+from .isolate import Supervisor
+from .memory import DocumentMemory, MemoryReport
+from .metrics import Metrics, collect, instrumented, touch
+from .patch import format_patch, make_patch, snapshot
+from .progress import REPORT_INTERVAL, Progress, StatusStream
+from .shard import (
+    merge_failed,
+    merge_manifests,
+    parse_shard,
+    plan_shards,
+    write_manifest,
+)
+from .store import OutputStore, replace_file
+from .validate import ValidationReport, validation_supported
+from .watch import Watcher
+
 _logger = logging.getLogger("cwl-upgrader")  # pylint: disable=invalid-name
 defaultStreamHandler = logging.StreamHandler()  # pylint: disable=invalid-name
-_logger.addHandler(defaultStreamHandler)
 _logger.setLevel(logging.INFO)
 
-yaml = ruamel.yaml.main.YAML(typ="rt")
-yaml.allow_duplicate_keys = True
-yaml.preserve_quotes = True
-yaml.default_flow_style = False
+
+def new_yaml() -> ruamel.yaml.main.YAML:
+    """Create a Ruamel YAML round-trip instance configured for CWL documents."""
+    instance = ruamel.yaml.main.YAML(typ="rt")
+    instance.allow_duplicate_keys = True
+    instance.preserve_quotes = True
+    instance.default_flow_style = False
+    return instance
+
+
+yaml = new_yaml()
 
 
 def parse_args(args: list[str]) -> argparse.Namespace:
@@ -51,10 +89,156 @@ def parse_args(args: list[str]) -> argparse.Namespace:
         help="Always write a file, even if no changes were made.",
         action="store_true",
     )
+    parser.add_argument(
+        "--validate",
+        help="Validate the upgraded documents against the schema of their new "
+        "cwlVersion before writing them; invalid documents are not written. "
+        "Requires the cwl-utils package.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--patch",
+        help="Instead of the upgraded documents, write an RFC 6902 JSON Patch "
+        "against each original document, named '<input name>.patch.json'. "
+        "Referenced 'run:' and '$import' documents are still written in full.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--full-rewrite",
+        help="Always re-serialize the upgraded documents, even those where "
+        "only the cwlVersion line needs to change.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--rewrite-expression-paths",
+        help="For draft-3 documents, rewrite File 'path' references to "
+        "'location' in all expressions (like outputEval, valueFrom, arguments "
+        "and glob), not only in secondaryFiles.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Write per-rule call counts, hits, rewritten nodes and cumulative "
+        "time to this file.",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        help="Format of the --metrics file.",
+        choices=["json", "prometheus"],
+        default="json",
+    )
+    parser.add_argument(
+        "--memory-report",
+        help="Trace memory allocations, and write the peak and retained memory "
+        "of each document, and of each phase of its upgrade, to this JSON file. "
+        "Slows down the upgrade.",
+    )
+    parser.add_argument(
+        "--base-dir",
+        help="Directory against which the 'run:' and '$import' references of "
+        "a document read from the standard input are resolved.",
+        default=Path.cwd(),
+    )
+    parser.add_argument(
+        "--inline",
+        help="Embed the upgraded 'run:' and '$import' documents in the "
+        "documents that reference them, instead of writing them to --dir.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--store",
+        help="Content-addressed store directory: every distinct output is "
+        "written there once and hard linked (or copied) into place, and the "
+        "upgrades of identical standalone documents are only computed once, "
+        "across runs too.",
+    )
+    parser.add_argument(
+        "--watch",
+        help="After upgrading the inputs, keep watching them and the 'run:' "
+        "and '$import' documents they reference, and upgrade again the inputs "
+        "affected by every change, until interrupted.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--since",
+        help="Only upgrade the inputs that changed since this git revision, "
+        "or that reference a document that changed, through 'run:' or "
+        "'$import'. Uses the git repository of the working directory.",
+        metavar="REV",
+    )
+    parser.add_argument(
+        "--isolate",
+        help="Upgrade each input in its own worker process, so that a "
+        "document that fails, or exceeds --cpu-limit or --memory-limit, is "
+        "recorded and skipped without stopping the others.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--jobs",
+        help="Number of worker processes running at the same time with "
+        "--isolate; defaults to the number of CPUs.",
+        type=int,
+        default=os.cpu_count() or 1,
+    )
+    parser.add_argument(
+        "--cpu-limit",
+        help="Maximum CPU time to upgrade each input, in seconds. Implies "
+        "--isolate.",
+        metavar="SECONDS",
+        type=int,
+    )
+    parser.add_argument(
+        "--memory-limit",
+        help="Maximum memory to upgrade each input, in MiB, on top of what "
+        "the worker process starts with. Implies --isolate.",
+        metavar="MIB",
+        type=int,
+    )
+    parser.add_argument(
+        "--progress",
+        help="Show the progress, throughput, documents being upgraded and "
+        "estimated time left on a status line, if the standard error is a "
+        "terminal.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--progress-file",
+        help="Append the progress as a JSON object per line to this file, "
+        "periodically while upgrading.",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        help="Seconds between two progress reports.",
+        type=float,
+        default=REPORT_INTERVAL,
+    )
+    parser.add_argument(
+        "--shard",
+        help="Only upgrade the INDEX-th (starting at 1) of COUNT parts of the "
+        "inputs. Workflows are kept together with the documents they "
+        "reference, and the parts are balanced by estimated cost. All shards "
+        "must be given the same inputs.",
+        metavar="INDEX/COUNT",
+        type=parse_shard,
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Where to write the manifest of a --shard run; defaults to "
+        "'shard-INDEX-of-COUNT.json' in the output directory.",
+    )
+    parser.add_argument(
+        "--merge-manifests",
+        help="Instead of upgrading, combine the shard manifests given as "
+        "inputs into a single JSON report on the standard output. Fails if a "
+        "shard is missing, two shards wrote the same output, or a document "
+        "was invalid or failed.",
+        action="store_true",
+    )
     parser.add_argument(
         "inputs",
         nargs="+",
-        help="One or more CWL documents.",
+        help="One or more CWL documents. Use '-' to read a document from the "
+        "standard input and write the upgraded version to the standard output.",
     )
     return parser.parse_args(args)
 
@@ -63,44 +247,623 @@ def main(args: list[str] | None = None) -> int:
     """Run with optional arguments override."""
     if not args:
         args = sys.argv[1:]
+    if defaultStreamHandler not in _logger.handlers:
+        _logger.addHandler(defaultStreamHandler)
     return run(parse_args(args))
 
 
 def run(args: argparse.Namespace) -> int:
     """Run the program using the provided arguments."""
-    imports: set[str] = set()
+    if args.merge_manifests:
+        report = merge_manifests(args.inputs)
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 1 if merge_failed(report) else 0
+    if args.inputs.count("-") > 1:
+        _logger.error("The standard input ('-') can only be given once.")
+        return 1
+    if args.watch and "-" in args.inputs:
+        _logger.error("The standard input ('-') can't be watched.")
+        return 1
+    isolate = args.isolate or args.cpu_limit or args.memory_limit
+    if isolate and "-" in args.inputs:
+        _logger.error("The standard input ('-') can't be upgraded in a worker.")
+        return 1
+    if isolate and (args.watch or args.metrics or args.memory_report):
+        _logger.error(
+            "--isolate, --cpu-limit and --memory-limit can't be combined with "
+            "--watch, --metrics or --memory-report."
+        )
+        return 1
+    if args.validate and not validation_supported():
+        _logger.error(
+            "--validate requires cwl-utils: pip install cwl-upgrader[validate]"
+        )
+        return 1
     if args.dir and not os.path.exists(args.dir):
         os.makedirs(args.dir)
-    for path in args.inputs:
-        _logger.info("Processing %s", path)
-        document = load_cwl_document(path)
-        if "cwlVersion" not in document:
-            _logger.warn("No cwlVersion found in %s, skipping it.", path)
+    if args.v1_only:
+        target_version = "v1.0"
+    elif args.v1_1_only:
+        target_version = "v1.1"
+    else:
+        target_version = "latest"
+    upgrader = Upgrader(
+        args.dir,
+        target_version,
+        always_write=args.always_write,
+        full_rewrite=args.full_rewrite,
+        patch=args.patch,
+        rewrite_expression_paths=args.rewrite_expression_paths,
+        inline=args.inline,
+        base_dir=str(args.base_dir),
+        validate=args.validate,
+        cache=args.watch,
+        store=OutputStore(args.store) if args.store else None,
+        metrics=Metrics() if args.metrics else None,
+        memory=MemoryReport() if args.memory_report else None,
+    )
+    inputs = args.inputs
+    if args.since:
+        try:
+            changed = changed_files(args.since)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            _logger.error(
+                "Can't list the files changed since %s: %s",
+                args.since,
+                getattr(exc, "stderr", None) or exc,
+            )
+            return 1
+        inputs = select_changed(inputs, changed)
+        _logger.info(
+            "%d of %d documents affected by the changes since %s.",
+            len(inputs),
+            len(args.inputs),
+            args.since,
+        )
+    if args.shard:
+        shard, shards = args.shard
+        selected = inputs
+        inputs = plan_shards(selected, shards)[shard - 1]
+        _logger.info(
+            "Shard %d/%d: %d of %d documents.",
+            shard,
+            shards,
+            len(inputs),
+            len(selected),
+        )
+    status = None
+    if args.progress and sys.stderr.isatty():
+        status = StatusStream(sys.stderr)
+    progress = None
+    if status is not None or args.progress_file:
+        progress = Progress(inputs, status, args.progress_file, args.progress_interval)
+    supervisor = None
+    with _progress(progress, status):
+        if isolate:
+            supervisor = Supervisor(
+                upgrader,
+                args.jobs,
+                args.cpu_limit,
+                args.memory_limit,
+                progress=progress,
+            )
+            supervisor.run(inputs)
+        elif progress is None:
+            for path in inputs:
+                upgrader.upgrade_file(path)
         else:
-            if document["cwlVersion"] == "v1.0":
-                if args.v1_only:
-                    _logger.info("Skipping v1.0 document as requested: %s.", path)
-                    continue
-            elif document["cwlVersion"] == "v1.1":
-                if args.v1_1_only:
-                    _logger.info("Skipping v1.1 document as requested: %s.", path)
-                    continue
-
-            if args.v1_only:
-                target_version = "v1.0"
-            elif args.v1_1_only:
-                target_version = "v1.1"
+            for path in inputs:
+                progress.start(path)
+                upgrader.upgrade_file(path)
+                progress.finish(path)
+    if args.watch:
+        Watcher(upgrader, inputs).run()
+    if upgrader.store is not None:
+        _logger.info("Reused %d stored upgrade(s).", upgrader.store.hits)
+    if args.shard:
+        write_manifest(
+            args.manifest or os.path.join(args.dir, f"shard-{shard}-of-{shards}.json"),
+            shard,
+            shards,
+            inputs,
+            (os.path.relpath(output, args.dir) for output in upgrader.written),
+            upgrader.report.invalid if upgrader.report is not None else None,
+            supervisor.failures if supervisor is not None else None,
+        )
+    if upgrader.metrics is not None:
+        upgrader.metrics.write(args.metrics, args.metrics_format)
+    if upgrader.memory is not None:
+        upgrader.memory.stop()
+        upgrader.memory.write(args.memory_report)
+        upgrader.memory.log_summary(_logger)
+    if upgrader.report is not None:
+        upgrader.report.log_summary()
+    if supervisor is not None:
+        supervisor.log_summary()
+        if supervisor.failures:
+            return 1
+    if upgrader.report is not None and upgrader.report.invalid:
+        return 1
+    return 0
+
+
+@contextmanager
+def _progress(progress: Progress | None, status: StatusStream | None) -> Iterator[None]:
+    """Report the progress in this context, keeping the logs above the status."""
+    if progress is None:
+        yield
+        return
+    stream = defaultStreamHandler.stream
+    if status is not None and stream is status.terminal:
+        defaultStreamHandler.setStream(status)  # type: ignore[arg-type]
+    try:
+        with progress:
+            yield
+    finally:
+        defaultStreamHandler.setStream(stream)
+
+
+OutputSink = Callable[[Path, str, bool], None]
+
+
+def write_to_disk(path: Path, content: str, executable: bool) -> None:
+    """
+    Write an output file, setting its executable bit if requested.
+
+    The file is replaced rather than written in place, so that an existing
+    output hard linked elsewhere (see OutputStore) is left alone.
+    """
+    replace_file(path, content, executable)
+
+
+_active_upgrader: ContextVar["Upgrader | None"] = ContextVar(
+    "cwl_upgrader", default=None
+)
+
+
+class Upgrader:
+    """
+    Upgrade CWL documents, keeping all the state on the instance.
+
+    Each instance has its own YAML parser and emitter, '$import' cache,
+    logger, metrics, validation report and output sink, so separate
+    instances can be used concurrently from different threads.
+    A single instance must not be shared between threads.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        target_version: str = "latest",
+        *,
+        always_write: bool = False,
+        full_rewrite: bool = False,
+        patch: bool = False,
+        rewrite_expression_paths: bool = False,
+        inline: bool = False,
+        base_dir: str | None = None,
+        validate: bool = False,
+        cache: bool = False,
+        store: OutputStore | None = None,
+        metrics: Metrics | None = None,
+        memory: MemoryReport | None = None,
+        logger: logging.Logger | None = None,
+        sink: OutputSink = write_to_disk,
+        yaml_instance: ruamel.yaml.main.YAML | None = None,
+    ) -> None:
+        """
+        Configure the upgrade.
+
+        The sink receives the path, the serialized content and whether the
+        output should be executable, for every file that would be written;
+        the default writes them to disk.
+        With inline, the upgraded 'run:' and '$import' documents are embedded
+        in the documents that reference them instead of being written out.
+        The references of a document read from the standard input ('-')
+        are resolved against base_dir, by default the working directory.
+        With cache, parsed documents are kept in memory, and only parsed again
+        once their text changes.
+        With a store, the outputs are written to it once and hard linked into
+        place, and the upgrades of standalone documents are reused.
+        """
+        self.output_dir = str(output_dir)
+        self.target_version = target_version
+        self.always_write = always_write
+        self.full_rewrite = full_rewrite
+        self.patch = patch
+        self.rewrite_expression_paths = rewrite_expression_paths
+        self.inline = inline
+        self.base_dir = base_dir if base_dir is not None else os.getcwd()
+        self.metrics = metrics
+        self.memory = memory
+        self.logger = logger if logger is not None else _logger
+        self.report = ValidationReport(self.logger) if validate else None
+        self.store = store
+        self.sink = store.write if store is not None and sink is write_to_disk else sink
+        self.yaml = yaml_instance if yaml_instance is not None else new_yaml()
+        self.imports: set[str] = set()
+        self.written: list[str] = []
+        # absolute paths of the documents read from JSON, to be written as JSON
+        self._json_sources: set[str] = set()
+        # source files read while upgrading each input, by absolute path
+        self.dependencies: dict[str, set[str]] = {}
+        self._reads: set[str] | None = None
+        self._writes: set[str] = set()
+        # the 'run:' documents being upgraded, from the input to the innermost
+        self._runs: list[str] = []
+        # parsed documents and their text, by absolute path
+        self._cache: dict[str, tuple[str, Any]] | None = {} if cache else None
+        # outputs that can't be read back from disk, for multi-stage upgrades
+        self._sunk: dict[str, str] | None = (
+            None if sink is write_to_disk and not inline else {}
+        )
+
+    @contextmanager
+    def activate(self) -> Iterator["Upgrader"]:
+        """Route the module level load and write functions to this instance."""
+        token = _active_upgrader.set(self)
+        try:
+            with collect(self.metrics):
+                yield self
+        finally:
+            _active_upgrader.reset(token)
+
+    @contextmanager
+    def following(self, path: str) -> Iterator[None]:
+        """Upgrade a 'run:' document in this context, failing on reference cycles."""
+        key = os.path.abspath(path)
+        if key in self._runs:
+            cycle = self._runs[self._runs.index(key) :] + [key]
+            raise Exception("Cycle in 'run:' references: " + " -> ".join(cycle))
+        self._runs.append(key)
+        try:
+            yield
+        finally:
+            self._runs.pop()
+
+    def read(self, path: str) -> str:
+        """Read the text of a document, from the standard input if path is '-'."""
+        if path == "-":
+            return sys.stdin.read()
+        if self._sunk is not None and os.path.abspath(path) in self._sunk:
+            return self._sunk[os.path.abspath(path)]
+        with open(path) as entry:
+            return entry.read()
+
+    def parse(self, text: str, path: str) -> Any:
+        """
+        Parse the text of a document read from path.
+
+        JSON documents are parsed with the json module, which is much faster
+        than the round-trip YAML parser, and are written back as JSON.
+        """
+        filename = self._filename(path)
+        if is_json(text):
+            try:
+                document = load_json(text)
+            except ValueError:
+                pass
             else:
-                target_version = "latest"
-            upgraded_document = upgrade_document(
-                document,
-                args.dir,
-                target_version=target_version,
-                imports=imports,
+                self._json_sources.add(os.path.abspath(filename))
+                add_lc_filename(document, filename)
+                return document
+        self._json_sources.discard(os.path.abspath(filename))
+        document = self.yaml.load(text)
+        add_lc_filename(document, filename)
+        return document
+
+    def _filename(self, path: str) -> str:
+        """The file name of a document, for the standard input if path is '-'."""
+        return os.path.join(self.base_dir, "<stdin>") if path == "-" else str(path)
+
+    def _is_json_source(self, path: str) -> bool:
+        """Check if the document last loaded from path was JSON."""
+        return os.path.abspath(self._filename(path)) in self._json_sources
+
+    def load(self, path: str) -> Any:
+        """Load a CWL document using this instance's YAML parser."""
+        return self._load(path)[1]
+
+    def _load(self, path: str, text: str | None = None) -> tuple[str, Any]:
+        """Read and parse a document, returning both its text and its tree."""
+        key = os.path.abspath(path)
+        if text is None:
+            text = self.read(path)
+        if path == "-":
+            return text, self.parse(text, path)
+        if self._reads is not None and key not in self._writes:
+            self._reads.add(key)
+        if self._cache is None:
+            return text, self.parse(text, path)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != text:
+            cached = self._cache[key] = (text, self.parse(text, path))
+        # the transformations modify the documents in place
+        return text, copy.deepcopy(cached[1])
+
+    def emit(self, path: Path, content: str, executable: bool) -> None:
+        """Pass an output file to the sink, unless it is to be inlined."""
+        if not self.inline:
+            self._deliver(path, content, executable)
+        elif self._sunk is not None:
+            self._sunk[os.path.abspath(path)] = content
+
+    def _deliver(self, path: Path, content: str, executable: bool) -> None:
+        if self._sunk is not None:
+            self._sunk[os.path.abspath(path)] = content
+        if self._reads is not None:
+            self._writes.add(os.path.abspath(path))
+        # the default instance serves the module level functions, outside of
+        # any run whose outputs would be reported
+        if self is not _default_upgrader:
+            self.written.append(str(path))
+        self.sink(path, content, executable)
+
+    def inline_references(self, document: Any) -> Any:
+        """Replace the references to upgraded documents with their contents."""
+        self._inline(document, set())
+        return document
+
+    def _inlined(self, reference: str, seen: set[str]) -> Any | None:
+        """Load an upgraded document to embed, if it was written by the upgrade."""
+        key = os.path.abspath(Path(self.output_dir) / Path(reference).name)
+        if self._sunk is None or key not in self._sunk or key in seen:
+            return None
+        process = self.parse(self._sunk[key], key)
+        if hasattr(process, "ca"):
+            process.ca.comment = None
+        if isinstance(process, MutableMapping):
+            process.pop("cwlVersion", None)
+        self._inline(process, seen | {key})
+        touch("inline_reference")
+        return process
+
+    def _inline(self, node: Any, seen: set[str]) -> None:
+        if isinstance(node, MutableMapping):
+            items: Any = node.items()
+        elif isinstance(node, MutableSequence):
+            items = enumerate(node)
+        else:
+            return
+        for key, value in list(items):
+            match key, value:
+                case "run", str(run) if "#" not in run:
+                    process = self._inlined(run, seen)
+                    if process is not None:
+                        node[key] = process
+                case _, {"$import": str(reference)} if len(value) == 1:
+                    process = self._inlined(reference, seen)
+                    if process is not None:
+                        node[key] = process
+                    else:
+                        self._inline(value, seen)
+                case _:
+                    self._inline(value, seen)
+
+    def dumps(self, document: Any) -> str:
+        """Serialize a CWL document using this instance's YAML emitter."""
+        ruamel.yaml.scalarstring.walk_tree(document)
+        stream = io.StringIO()
+        if "cwlVersion" in document:
+            if not (
+                document.ca
+                and document.ca.comment
+                and "cwl-runner" in document.ca.comment[1][0].value
+            ):
+                stream.write("#!/usr/bin/env cwl-runner\n")
+        self.yaml.dump(document, stream=stream)
+        return stream.getvalue()
+
+    def dumps_json(self, document: Any) -> str:
+        """Serialize a CWL document read from JSON, keeping the key order."""
+        return json.dumps(document, indent=4, ensure_ascii=False) + "\n"
+
+    def write(
+        self,
+        document: Any,
+        name: str,
+        dirname: str | None = None,
+        source: str | None = None,
+    ) -> None:
+        """
+        Serialize a document and pass it to the output sink.
+
+        The document is written as JSON if it was loaded from JSON, from
+        source or else from the file name recorded on it. With validation,
+        an invalid CWL process is recorded in the report and not written.
+        """
+        path = Path(dirname if dirname is not None else self.output_dir) / name
+        if source is None and hasattr(document, "lc"):
+            source = getattr(document.lc, "filename", None)
+        if (
+            self.report is not None
+            and "cwlVersion" in document
+            and not self.report.check(
+                document, source if source is not None else str(path), str(path)
+            )
+        ):
+            return
+        if source is not None and self._is_json_source(source):
+            self.emit(path, self.dumps_json(document), False)
+        else:
+            self.emit(path, self.dumps(document), "cwlVersion" in document)
+
+    def write_text(self, text: str, name: str, dirname: str | None = None) -> None:
+        """Pass an already serialized CWL document to the output sink."""
+        path = Path(dirname if dirname is not None else self.output_dir) / name
+        self.emit(path, with_shebang(text), True)
+
+    def upgrade(self, document: Any) -> Any:
+        """Upgrade an already loaded document to the target version."""
+        with self.activate():
+            return upgrade_document(
+                document, self.output_dir, self.target_version, self.imports
             )
-            if upgraded_document is not document or not args.always_write:
-                write_cwl_document(upgraded_document, Path(path).name, args.dir)
-    return 0
+
+    def upgrade_file(self, path: str) -> None:
+        """Load, upgrade, optionally validate, and write a single document."""
+        self._reads = set()
+        self._runs = [os.path.abspath(path)]
+        try:
+            with self.activate():
+                if self.memory is None:
+                    self._upgrade_file(path, None)
+                else:
+                    with self.memory.document(path) as memory:
+                        self._upgrade_file(path, memory)
+        finally:
+            key = os.path.abspath(path)
+            self.dependencies[key] = self._reads - {key}
+            self._reads = None
+            self._writes.clear()
+            self._runs = []
+
+    def _phase(self, name: str) -> AbstractContextManager[None]:
+        """Account the memory allocated in this context to a phase, if enabled."""
+        return nullcontext() if self.memory is None else self.memory.phase(name)
+
+    def _upgrade_file(self, path: str, memory: DocumentMemory | None) -> None:
+        self.logger.info("Processing %s", path)
+        with self._phase("load"):
+            text = self.read(path)
+            key = self._store_key(path, text)
+            stored = None
+            if key is not None and self.store is not None:
+                digest = self.store.lookup(key)
+                if digest is not None:
+                    stored = self.store.get(digest)
+            if stored is None:
+                text, document = self._load(path, text)
+        if memory is not None:
+            memory.size = len(text)
+        if stored is not None and self.store is not None:
+            self._reuse(self.store, path, *stored)
+            return
+        if "cwlVersion" not in document:
+            self.logger.warning("No cwlVersion found in %s, skipping it.", path)
+            self._pass_through(path, text)
+            return
+        version = document["cwlVersion"]
+        if version == self.target_version and version in ("v1.0", "v1.1"):
+            self.logger.info("Skipping %s document as requested: %s.", version, path)
+            self._pass_through(path, text)
+            return
+        # the output only depends on the source text, and can be stored
+        standalone = key is not None and not (
+            _has_import(document) or _runs_files(document)
+        )
+        name = Path(path).name
+        as_json = self._is_json_source(path)
+        with self._phase("upgrade"):
+            original = snapshot(document) if self.patch else None
+            upgraded_text = None
+            if (
+                not as_json
+                and not self.full_rewrite
+                and needs_only_version_bump(document, self.target_version)
+            ):
+                upgraded_text = bump_cwl_version_text(
+                    text, TARGET_VERSIONS[self.target_version]
+                )
+            if upgraded_text is not None:
+                self.logger.info("Only the cwlVersion of %s needs to change.", path)
+                touch("version_bump_fast_path")
+                document["cwlVersion"] = TARGET_VERSIONS[self.target_version]
+                upgraded_document = document
+            else:
+                upgraded_document = upgrade_document(
+                    document, self.output_dir, self.target_version, self.imports
+                )
+                if upgraded_document is None:
+                    self._pass_through(path, text)
+                    return
+            if self.inline:
+                self.inline_references(upgraded_document)
+        if self.metrics is not None:
+            self.metrics.documents += 1
+        destination = Path(self.output_dir) / name
+        if self.report is not None:
+            with self._phase("validate"):
+                valid = self.report.check(
+                    upgraded_document,
+                    path,
+                    str(destination if path != "-" else Path(self.base_dir) / name),
+                )
+            if not valid:
+                return
+        with self._phase("serialize"):
+            if self.patch:
+                destination = destination.with_name(f"{name}.patch.json")
+                content = format_patch(make_patch(original, upgraded_document))
+            elif upgraded_text is not None:
+                content = with_shebang(upgraded_text)
+            elif upgraded_document is not document or not self.always_write:
+                if as_json:
+                    content = self.dumps_json(upgraded_document)
+                else:
+                    content = self.dumps(upgraded_document)
+            else:
+                self._pass_through(path, text)
+                return
+        executable = not (self.patch or as_json)
+        with self._phase("write"):
+            if path == "-":
+                sys.stdout.write(content)
+                sys.stdout.flush()
+            else:
+                self._deliver(destination, content, executable)
+        if key is not None and self.store is not None and standalone:
+            self.store.record(key, self.store.put(content, executable))
+
+    def _pass_through(self, path: str, text: str) -> None:
+        """Leave a document as it was; from stdin, copy it to stdout unchanged."""
+        if path == "-":
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def _store_key(self, path: str, text: str) -> str | None:
+        """Key the upgrade of a source in the store, if there is one."""
+        if self.store is None or path == "-":
+            return None
+        return self.store.key(
+            text,
+            [
+                TARGET_VERSIONS.get(self.target_version, self.target_version),
+                self.always_write,
+                self.full_rewrite,
+                self.patch,
+                self.rewrite_expression_paths,
+                self.inline,
+                self.report is not None,
+            ],
+        )
+
+    def _reuse(
+        self, store: OutputStore, path: str, content: str, executable: bool
+    ) -> None:
+        """Write the stored upgrade of a standalone document."""
+        self.logger.info("Reusing the stored upgrade of %s.", path)
+        store.hits += 1
+        touch("store_hit")
+        if self.metrics is not None:
+            self.metrics.documents += 1
+        if self.report is not None:
+            self.report.valid.append(path)
+        name = Path(path).name
+        if self.patch:
+            name = f"{name}.patch.json"
+        with self._phase("write"):
+            self._deliver(Path(self.output_dir) / name, content, executable)
+
+
+_default_upgrader = Upgrader(".", yaml_instance=yaml)
+
+
+def _current_upgrader() -> Upgrader:
+    """Get the Upgrader active in this context, or the module level default."""
+    upgrader = _active_upgrader.get()
+    return _default_upgrader if upgrader is None else upgrader
 
 
 def upgrade_document(
@@ -111,9 +874,10 @@ def upgrade_document(
 ) -> Any:
     if imports is None:
         imports = set()
+    logger = _current_upgrader().logger
     supported_versions = ["v1.0", "v1.1", "v1.2", "latest"]
     if target_version not in supported_versions:
-        _logger.error(f"Unsupported target cwlVersion: {target_version}")
+        logger.error(f"Unsupported target cwlVersion: {target_version}")
         return
 
     version = document["cwlVersion"]
@@ -135,7 +899,7 @@ def upgrade_document(
         case "v1.0":
             match target_version:
                 case "v1.0":
-                    _logger.info("Not upgrading v1.0 document as requested.")
+                    logger.info("Not upgrading v1.0 document as requested.")
                     return
                 case "v1.1":
                     main_updater = v1_0_to_v1_1
@@ -146,7 +910,7 @@ def upgrade_document(
         case "v1.1":
             match target_version:
                 case "v1.1":
-                    _logger.info("Not upgrading v1.1 document as requested.")
+                    logger.info("Not upgrading v1.1 document as requested.")
                     return
                 case "v1.2" | "latest":
                     main_updater = v1_1_to_v1_2
@@ -154,16 +918,16 @@ def upgrade_document(
         case "v1.2":
             match target_version:
                 case "v1.2":
-                    _logger.info("Not upgrading v1.2 document as requested.")
+                    logger.info("Not upgrading v1.2 document as requested.")
                     return document
                 case "latest":
                     return document
         case _:
-            _logger.error(f"Unknown cwlVersion in source document: {version}")
+            logger.error(f"Unknown cwlVersion in source document: {version}")
             return
 
     if main_updater is None or inner_updater is None:
-        _logger.error(f"Cannot downgrade from cwlVersion {version} to {target_version}")
+        logger.error(f"Cannot downgrade from cwlVersion {version} to {target_version}")
         return
 
     process_imports(document, imports, inner_updater, output_dir)
@@ -175,34 +939,88 @@ def load_cwl_document(path: str) -> Any:
     Load the given path using the Ruamel YAML round-trip loader.
 
     Also ensures that the filename is recorded so that SourceLine can produce
-    informative error messages.
+    informative error messages. Uses the YAML instance of the active Upgrader.
     """
-    with open(path) as entry:
-        document = yaml.load(entry)
-        add_lc_filename(document, entry.name)
-    return document
+    return _current_upgrader().load(path)
 
 
-def write_cwl_document(document: Any, name: str, dirname: str) -> None:
+def follow_run(path: Path) -> AbstractContextManager[None]:
+    """Upgrade the 'run:' document at path in this context, detecting cycles."""
+    return _current_upgrader().following(str(path))
+
+
+def write_cwl_document(
+    document: Any, name: str, dirname: str, source: str | None = None
+) -> None:
     r"""
     Serialize the document using the Ruamel YAML round trip dumper.
 
     Will also prepend "#!/usr/bin/env cwl-runner\n" and
     set the executable bit if it is a CWL document.
+    Documents loaded from JSON, from source if given, are written as JSON.
+    The output goes to the sink of the active Upgrader.
     """
-    ruamel.yaml.scalarstring.walk_tree(document)
-    path = Path(dirname) / name
-    with open(path, "w") as handle:
-        if "cwlVersion" in document:
-            if not (
-                document.ca
-                and document.ca.comment
-                and "cwl-runner" in document.ca.comment[1][0].value
-            ):
-                handle.write("#!/usr/bin/env cwl-runner\n")
-        yaml.dump(document, stream=handle)
-    if "cwlVersion" in document:
-        path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    _current_upgrader().write(document, name, dirname, source)
+
+
+CWL_VERSION_LINE = re.compile(
+    r"^cwlVersion[ \t]*:[ \t]*(['\"]?)(v1\.[0-2])\1[ \t]*(?:#.*)?$",
+    re.MULTILINE,
+)
+
+
+def bump_cwl_version_text(text: str, version: str) -> str | None:
+    """
+    Edit the top level cwlVersion of a YAML CWL document in its source text.
+
+    Returns None if there isn't exactly one block style 'cwlVersion' line.
+    """
+    matches = list(CWL_VERSION_LINE.finditer(text))
+    if len(matches) != 1:
+        return None
+    start, end = matches[0].span(2)
+    return text[:start] + version + text[end:]
+
+
+JSON_START = re.compile(r"\s*[{[]")
+
+
+def is_json(text: str) -> bool:
+    """Check if a document looks like JSON rather than block style YAML."""
+    return JSON_START.match(text) is not None
+
+
+def load_json(text: str) -> Any:
+    """Parse JSON into the same ruamel.yaml containers as the YAML loader."""
+
+    def commented(node: Any) -> Any:
+        if isinstance(node, list):
+            return CommentedSeq(commented(value) for value in node)
+        if isinstance(node, CommentedMap):
+            for key, value in node.items():
+                if isinstance(value, (list, CommentedMap)):
+                    node[key] = commented(value)
+        return node
+
+    return commented(json.loads(text, object_pairs_hook=CommentedMap))
+
+
+def with_shebang(text: str) -> str:
+    """Prepend the cwl-runner shebang, unless the leading comments mention it."""
+    leading_comments = re.match(r"(?:[ \t]*(?:#.*)?\n)*", text)
+    if not leading_comments or "cwl-runner" not in leading_comments[0]:
+        return "#!/usr/bin/env cwl-runner\n" + text
+    return text
+
+
+def write_cwl_text(text: str, name: str, dirname: str) -> None:
+    """
+    Write an already serialized CWL document.
+
+    Like write_cwl_document, prepends "#!/usr/bin/env cwl-runner\n" if
+    the leading comments don't mention cwl-runner, and sets the executable bit.
+    """
+    _current_upgrader().write_text(text, name, dirname)
 
 
 def process_imports(
@@ -213,15 +1031,12 @@ def process_imports(
         for key, value in document.items():
             if key == "$import":
                 if value not in imports:
+                    path = Path(document.lc.filename).parent / value
                     write_cwl_document(
-                        updater(
-                            load_cwl_document(
-                                Path(document.lc.filename).parent / value
-                            ),
-                            outdir,
-                        ),
-                        Path(value).name,
+                        updater(load_cwl_document(str(path)), outdir),
+                        path.name,
                         outdir,
+                        str(path),
                     )
                     imports.add(value)
             else:
@@ -231,6 +1046,7 @@ def process_imports(
             process_imports(entry, imports, updater, outdir)
 
 
+@instrumented
 def v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
     """CWL v1.0.x to v1.1 transformation loop."""
     _v1_0_to_v1_1(document, outdir)
@@ -246,6 +1062,7 @@ def v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
     return sort_v1_0(document)
 
 
+@instrumented
 def v1_0_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     """CWL v1.0.x to v1.2 transformation."""
     document = v1_0_to_v1_1(document, outdir)
@@ -253,6 +1070,7 @@ def v1_0_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     return document
 
 
+@instrumented
 def v1_1_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     """CWL v1.1 to v1.2 transformation."""
     document = _v1_1_to_v1_2(document, outdir)
@@ -260,6 +1078,7 @@ def v1_1_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     return document
 
 
+@instrumented
 def draft3_to_v1_0(document: CommentedMap, outdir: str) -> CommentedMap:
     """Transform a draft3 document to a version 1.0 document."""
     _draft3_to_v1_0(document, outdir)
@@ -276,16 +1095,19 @@ def draft3_to_v1_0(document: CommentedMap, outdir: str) -> CommentedMap:
     return sort_v1_0(document)
 
 
+@instrumented
 def draft3_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
     """Transform a draft3 document to a version 1.1 document."""
     return v1_0_to_v1_1(draft3_to_v1_0(document, outdir), outdir)
 
 
+@instrumented
 def draft3_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     """Transform a draft3 document to a version 1.2 document."""
     return v1_1_to_v1_2(v1_0_to_v1_1(draft3_to_v1_0(document, outdir), outdir), outdir)
 
 
+@instrumented
 def _draft3_to_v1_0(document: CommentedMap, outdir: str) -> CommentedMap:
     """Inner loop for transforming draft-3 to v1.0."""
     match document:
@@ -293,6 +1115,7 @@ def _draft3_to_v1_0(document: CommentedMap, outdir: str) -> CommentedMap:
             workflow_clean(document)
         case {"class": "File"}:
             document["location"] = document.pop("path")
+            touch("file_path_to_location")
         case {"class": "CommandLineTool"}:
             input_output_clean(document)
             hints_and_requirements_clean(document)
@@ -301,20 +1124,27 @@ def _draft3_to_v1_0(document: CommentedMap, outdir: str) -> CommentedMap:
                 and len(document["baseCommand"]) == 1
             ):
                 document["baseCommand"] = document["baseCommand"][0]
+                touch("single_base_command")
             if "arguments" in document and not document["arguments"]:
                 del document["arguments"]
+                touch("empty_arguments")
+    if _current_upgrader().rewrite_expression_paths:
+        clean_expressions(document)
     clean_secondary_files(document)
 
     if "description" in document:
         document["doc"] = document.pop("description")
+        touch("description_to_doc")
 
     return document
 
 
+@instrumented
 def _draft3_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
     return v1_0_to_v1_1(_draft3_to_v1_0(document, outdir), outdir)
 
 
+@instrumented
 def _draft3_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     return _draft3_to_v1_1(document, outdir)  # nothing needs doing for 1.2
 
@@ -334,6 +1164,7 @@ V1_0_TO_V1_1_REWRITE = {
 }
 
 
+@instrumented
 def _v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
     """Inner loop for transforming draft-3 to v1.0."""
     match document:
@@ -358,10 +1189,13 @@ def _v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
                                 and "#" not in entry["run"]
                             ):
                                 path = Path(document.lc.filename).parent / entry["run"]
-                                process = v1_0_to_v1_1(
-                                    load_cwl_document(str(path)), outdir
+                                with follow_run(path):
+                                    process = v1_0_to_v1_1(
+                                        load_cwl_document(str(path)), outdir
+                                    )
+                                write_cwl_document(
+                                    process, path.name, outdir, str(path)
                                 )
-                                write_cwl_document(process, path.name, outdir)
                 case MutableMapping() as steps:
                     for step_name in steps:
                         with SourceLine(steps, step_name, Exception):
@@ -374,10 +1208,13 @@ def _v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
                                         del process["cwlVersion"]
                                 case {"run": str(run)} if "#" not in run:
                                     path = Path(document.lc.filename).parent / run
-                                    process = v1_0_to_v1_1(
-                                        load_cwl_document(str(path)), outdir
+                                    with follow_run(path):
+                                        process = v1_0_to_v1_1(
+                                            load_cwl_document(str(path)), outdir
+                                        )
+                                    write_cwl_document(
+                                        process, path.name, outdir, str(path)
                                     )
-                                    write_cwl_document(process, path.name, outdir)
                                 case {"run": str(run)} if "#" in run:
                                     pass  # reference to $graph entry
                                 case _:
@@ -398,7 +1235,9 @@ def _v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
                 case {"requirements": MutableSequence() as reqs}:
                     if not network_access:
                         reqs.append({"class": "NetworkAccess", "networkAccess": True})
+                        touch("network_access_injection")
                     if not listing:
+                        touch("load_listing_injection")
                         reqs.append(
                             cmap(
                                 {
@@ -410,7 +1249,9 @@ def _v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
                 case {"requirements": MutableMapping() as reqs}:
                     if not network_access:
                         reqs["NetworkAccess"] = {"networkAccess": True}
+                        touch("network_access_injection")
                     if not listing:
+                        touch("load_listing_injection")
                         reqs["LoadListingRequirement"] = cmap(
                             {"loadListing": "deep_listing"}
                         )
@@ -420,11 +1261,13 @@ def _v1_0_to_v1_1(document: CommentedMap, outdir: str) -> CommentedMap:
     return document
 
 
+@instrumented
 def _v1_0_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     document = _v1_0_to_v1_1(document, outdir)
     return _v1_1_to_v1_2(document, outdir)
 
 
+@instrumented
 def _v1_1_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     match document:
         case {"class": "Workflow", "steps": MutableSequence() as steps}:
@@ -441,8 +1284,11 @@ def _v1_1_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
                             else:
                                 dirname = Path(outdir)
                             path = dirname / run
-                            process = v1_1_to_v1_2(load_cwl_document(str(path)), outdir)
-                            write_cwl_document(process, path.name, outdir)
+                            with follow_run(path):
+                                process = v1_1_to_v1_2(
+                                    load_cwl_document(str(path)), outdir
+                                )
+                            write_cwl_document(process, path.name, outdir, str(path))
         case {"class": "Workflow", "steps": MutableMapping() as steps}:
             for step_name in steps:
                 with SourceLine(steps, step_name, Exception):
@@ -457,8 +1303,11 @@ def _v1_1_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
                             else:
                                 dirname = Path(outdir)
                             path = dirname / run
-                            process = v1_1_to_v1_2(load_cwl_document(str(path)), outdir)
-                            write_cwl_document(process, path.name, outdir)
+                            with follow_run(path):
+                                process = v1_1_to_v1_2(
+                                    load_cwl_document(str(path)), outdir
+                                )
+                            write_cwl_document(process, path.name, outdir, str(path))
                         case {"run": str(run)} if "#" in run:
                             pass  # reference to $graph entry
                         case {"run": run}:
@@ -469,6 +1318,7 @@ def _v1_1_to_v1_2(document: CommentedMap, outdir: str) -> CommentedMap:
     return document
 
 
+@instrumented
 def cleanup_v1_0_input_bindings(document: dict[str, Any]) -> None:
     """In v1.1 Workflow or ExpressionTool level inputBindings are deprecated."""
 
@@ -481,6 +1331,7 @@ def cleanup_v1_0_input_bindings(document: dict[str, Any]) -> None:
                     prefix = "" if "doc" not in inp else "{}\n".format(inp["doc"])
                     inp["doc"] = WORKFLOW_INPUT_INPUTBINDING.format(prefix, field)
                     del bindings[field]
+                    touch("cleanup_v1_0_input_bindings")
             if not bindings:
                 del inp["inputBinding"]
 
@@ -493,6 +1344,7 @@ def cleanup_v1_0_input_bindings(document: dict[str, Any]) -> None:
             cleanup(inputs[input_name])
 
 
+@instrumented
 def move_up_loadcontents(document: dict[str, Any]) -> None:
     """Promote 'loadContents' up a level for CWL v1.1."""
 
@@ -503,6 +1355,7 @@ def move_up_loadcontents(document: dict[str, Any]) -> None:
             for field in list(bindings.keys()):
                 if field == "loadContents":
                     inp[field] = bindings.pop(field)
+                    touch("move_up_loadcontents")
 
     inputs = document["inputs"]
     if isinstance(inputs, MutableSequence):
@@ -513,6 +1366,7 @@ def move_up_loadcontents(document: dict[str, Any]) -> None:
             cleanup(inputs[input_name])
 
 
+@instrumented
 def upgrade_v1_0_hints_and_reqs(document: dict[str, Any]) -> None:
     """Rename some pre-v1.1 extensions to their official CWL v1.1 names."""
     for extra in ("requirements", "hints"):
@@ -525,6 +1379,7 @@ def upgrade_v1_0_hints_and_reqs(document: dict[str, Any]) -> None:
                                 document[extra][V1_0_TO_V1_1_REWRITE[req_name]] = (
                                     document[extra].pop(req_name)
                                 )
+                                touch("upgrade_v1_0_hints_and_reqs")
                 elif isinstance(document[extra], MutableSequence):
                     for index, entry in enumerate(document[extra]):
                         with SourceLine(document[extra], index, Exception):
@@ -534,6 +1389,7 @@ def upgrade_v1_0_hints_and_reqs(document: dict[str, Any]) -> None:
                                 and entry["class"] in V1_0_TO_V1_1_REWRITE
                             ):
                                 entry["class"] = V1_0_TO_V1_1_REWRITE[entry["id"]]
+                                touch("upgrade_v1_0_hints_and_reqs")
                 else:
                     raise Exception(
                         "{} section must be either a list of dictionaries "
@@ -559,6 +1415,147 @@ def has_hint_or_req(document: dict[str, Any], name: str) -> bool:
     return False
 
 
+TARGET_VERSIONS = {"v1.0": "v1.0", "v1.1": "v1.1", "v1.2": "v1.2", "latest": "v1.2"}
+
+
+def needs_only_version_bump(document: Any, target_version: str) -> bool:
+    """
+    Detect documents where upgrading changes nothing but the cwlVersion.
+
+    Mirrors the checks of the v1.0 to v1.1 and v1.1 to v1.2 transformations,
+    so that such documents can skip them and the full re-serialization.
+    """
+    match document.get("cwlVersion"):
+        case "v1.2":
+            return target_version in ("v1.2", "latest")
+        case "v1.1":
+            return target_version in ("v1.2", "latest") and _v1_1_unchanged(document)
+        case "v1.0":
+            if target_version == "v1.0" or _has_import(document):
+                return False
+            if list(sort_v1_0(document)) != list(document):
+                return False
+            nodes = [document]
+            for value in document.values():
+                if isinstance(value, CommentedMap):
+                    nodes.append(value)
+                elif isinstance(value, list):
+                    nodes.extend(e for e in value if isinstance(e, CommentedMap))
+            return all(_v1_0_unchanged(node) for node in nodes)
+    return False
+
+
+def _has_import(node: Any) -> bool:
+    """Search the whole document for an '$import'."""
+    if isinstance(node, MutableMapping):
+        return "$import" in node or any(_has_import(v) for v in node.values())
+    if isinstance(node, MutableSequence):
+        return any(_has_import(entry) for entry in node)
+    return False
+
+
+def _runs_files(node: Any) -> bool:
+    """Search the whole document for a 'run:' reference to another file."""
+    if isinstance(node, MutableMapping):
+        run = node.get("run")
+        if isinstance(run, str) and "#" not in run:
+            return True
+        return any(_runs_files(v) for v in node.values())
+    if isinstance(node, MutableSequence):
+        return any(_runs_files(entry) for entry in node)
+    return False
+
+
+def _entries(section: Any) -> list[Any]:
+    """List the entries of a map or list style 'inputs' or 'steps' section."""
+    if isinstance(section, MutableMapping):
+        return list(section.values())
+    if isinstance(section, MutableSequence):
+        return list(section)
+    return []
+
+
+def _has_input_bindings(document: Any) -> bool:
+    """Detect inputBinding on any of the inputs."""
+    return any(
+        isinstance(inp, MutableMapping) and "inputBinding" in inp
+        for inp in _entries(document.get("inputs"))
+    )
+
+
+def _has_v1_0_extensions(document: Any) -> bool:
+    """Detect hints or requirements that upgrade_v1_0_hints_and_reqs renames."""
+    for extra in ("requirements", "hints"):
+        match document.get(extra):
+            case None:
+                pass
+            case MutableMapping() as section:
+                if any(name in V1_0_TO_V1_1_REWRITE for name in section):
+                    return True
+            case MutableSequence() as section:
+                for entry in section:
+                    if (
+                        isinstance(entry, MutableMapping)
+                        and entry.get("class") in V1_0_TO_V1_1_REWRITE
+                    ):
+                        return True
+            case _:
+                return True
+    return False
+
+
+def _runs_only_graph_refs(document: Any) -> bool:
+    """Detect Workflows whose steps only refer to other '$graph' entries."""
+    return all(
+        isinstance(step, MutableMapping)
+        and isinstance(step.get("run"), str)
+        and "#" in step["run"]
+        for step in _entries(document.get("steps"))
+    )
+
+
+def _v1_0_unchanged(document: Any) -> bool:
+    """Check if _v1_0_to_v1_1 and _v1_1_to_v1_2 would leave this node as is."""
+    match document:
+        case {"class": "Workflow"}:
+            return (
+                not _has_v1_0_extensions(document)
+                and not _has_input_bindings(document)
+                and _runs_only_graph_refs(document)
+                and not any(
+                    _has_v1_0_extensions(step)
+                    for step in _entries(document.get("steps"))
+                )
+            )
+        case {"class": "CommandLineTool"}:
+            return (
+                "requirements" in document
+                and not _has_v1_0_extensions(document)
+                and not any(
+                    isinstance(inp, MutableMapping)
+                    and isinstance(inp.get("inputBinding"), MutableMapping)
+                    and "loadContents" in inp["inputBinding"]
+                    for inp in _entries(document.get("inputs"))
+                )
+                and has_hint_or_req(document, "NetworkAccess")
+                and has_hint_or_req(document, "LoadListingRequirement")
+            )
+        case {"class": "ExpressionTool"}:
+            return not _has_input_bindings(document)
+    return True
+
+
+def _v1_1_unchanged(document: Any) -> bool:
+    """Check if _v1_1_to_v1_2 and process_imports would leave this as is."""
+    if _has_import(document):
+        return False
+    match document:
+        case {"class": "Workflow"}:
+            return _runs_only_graph_refs(document)
+    return True
+
+
+@instrumented
 def workflow_clean(document: dict[str, Any]) -> None:
     """Transform draft-3 style Workflows to more idiomatic v1.0."""
     input_output_clean(document)
@@ -638,8 +1635,10 @@ def workflow_clean(document: dict[str, Any]) -> None:
                 step["doc"] = step.pop("description")
             new_steps[step_id.lstrip("#")] = step
     document["steps"] = new_steps
+    touch("workflow_clean", len(new_steps))
 
 
+@instrumented
 def input_output_clean(document: dict[str, Any]) -> None:
     """Transform draft-3 style input/output listings into idiomatic v1.0."""
     for param_type in ["inputs", "outputs"]:
@@ -658,6 +1657,7 @@ def input_output_clean(document: dict[str, Any]) -> None:
                     if "type" in param2:
                         param2["type"] = shorten_type(param2["type"])
                         array_type_raise_sf(param2)
+                    clean_secondary_files(param2)
                     if "description" in param2:
                         param2["doc"] = param2.pop("description")
                     if len(param2) > 1:
@@ -667,8 +1667,10 @@ def input_output_clean(document: dict[str, Any]) -> None:
                     else:
                         new_section[param_id] = param2
             document[param_type] = new_section
+            touch("input_output_clean", len(new_section))
 
 
+@instrumented
 def array_type_raise_sf(param: MutableMapping[str, Any]) -> None:
     """Move up draft-3 secondaryFile specs on File members in Arrays."""
     match param["type"]:
@@ -686,8 +1688,10 @@ def array_type_raise_sf(param: MutableMapping[str, Any]) -> None:
         ):
             param["secondaryFiles"] = sec_files
             del typ["secondaryFiles"]
+            touch("array_type_raise_sf")
 
 
+@instrumented
 def hints_and_requirements_clean(document: dict[str, Any]) -> None:
     """Transform draft-3 style hints/reqs into idiomatic v1.0 hints/reqs."""
     for section in ["hints", "requirements"]:
@@ -721,8 +1725,10 @@ def hints_and_requirements_clean(document: dict[str, Any]) -> None:
                         del entry2["class"]
             if not meta:
                 document[section] = new_section
+                touch("hints_and_requirements_clean", len(new_section))
 
 
+@instrumented
 def shorten_type(type_obj: str | list[Any]) -> str | list[Any]:
     """Transform draft-3 style type declarations into idiomatic v1.0 types."""
     if isinstance(type_obj, str) or not isinstance(type_obj, Sequence):
@@ -732,6 +1738,7 @@ def shorten_type(type_obj: str | list[Any]) -> str | list[Any]:
         if isinstance(entry, dict):
             if entry["type"] == "array" and isinstance(entry["items"], str):
                 entry = entry["items"] + "[]"
+                touch("shorten_type")
             elif entry["type"] == "enum":
                 entry = sort_enum(entry)
         new_type.extend([entry])
@@ -746,16 +1753,50 @@ def shorten_type(type_obj: str | list[Any]) -> str | list[Any]:
     return new_type
 
 
+@instrumented
 def clean_secondary_files(document: dict[str, Any]) -> None:
     """Cleanup for secondaryFiles."""
     if "secondaryFiles" in document:
-        for i, sfile in enumerate(document["secondaryFiles"]):
-            if "$(" in sfile or "${" in sfile:
-                document["secondaryFiles"][i] = sfile.replace(
-                    '"path"', '"location"'
-                ).replace(".path", ".location")
+        sec_files = document["secondaryFiles"]
+        if isinstance(sec_files, str):
+            cleaned = rewrite_path_to_location(sec_files)
+            if cleaned != sec_files:
+                document["secondaryFiles"] = cleaned
+                touch("clean_secondary_files")
+            return
+        for i, sfile in enumerate(sec_files):
+            if isinstance(sfile, str) and ("$(" in sfile or "${" in sfile):
+                cleaned = rewrite_path_to_location(sfile)
+                if cleaned != sfile:
+                    sec_files[i] = cleaned
+                    touch("clean_secondary_files")
+
+
+@instrumented
+def clean_expressions(document: dict[str, Any]) -> None:
+    """Rewrite draft-3 File 'path' references in all the expressions."""
+    _clean_expressions(document)
+
+
+def _clean_expressions(node: Any) -> None:
+    if isinstance(node, MutableMapping):
+        items: Any = node.items()
+    elif isinstance(node, MutableSequence):
+        items = enumerate(node)
+    else:
+        return
+    for key, value in items:
+        if isinstance(value, str):
+            if "$" in value:
+                cleaned = rewrite_path_to_location(value)
+                if cleaned != value:
+                    node[key] = cleaned
+                    touch("clean_expressions")
+        else:
+            _clean_expressions(value)
 
 
+@instrumented
 def sort_v1_0(document: dict[str, Any]) -> CommentedMap:
     """Sort the sections of the CWL document in a more meaningful order."""
     keyorder = [
@@ -779,25 +1820,29 @@ def sort_v1_0(document: dict[str, Any]) -> CommentedMap:
         "temporaryFailCodes",
         "permanentFailCodes",
     ]
+    rank = {key: index for index, key in enumerate(keyorder)}
     return CommentedMap(
         sorted(
             document.items(),
-            key=lambda i: keyorder.index(i[0]) if i[0] in keyorder else 100,
+            key=lambda i: rank.get(i[0], 100),
         )
     )
 
 
+@instrumented
 def sort_enum(enum: dict[str, Any]) -> dict[str, Any]:
     """Sort the enum type definitions in a more meaningful order."""
     keyorder = ["type", "name", "label", "symbols", "inputBinding"]
+    rank = {key: index for index, key in enumerate(keyorder)}
     return CommentedMap(
         sorted(
             enum.items(),
-            key=lambda i: keyorder.index(i[0]) if i[0] in keyorder else 100,
+            key=lambda i: rank.get(i[0], 100),
         )
     )
 
 
+@instrumented
 def sort_input_or_output(io_def: dict[str, Any]) -> dict[str, Any]:
     """Sort the input definitions in a more meaningful order."""
     keyorder = [
@@ -811,10 +1856,11 @@ def sort_input_or_output(io_def: dict[str, Any]) -> dict[str, Any]:
         "outputBinding",
         "streamable",
     ]
+    rank = {key: index for index, key in enumerate(keyorder)}
     return CommentedMap(
         sorted(
             io_def.items(),
-            key=lambda i: keyorder.index(i[0]) if i[0] in keyorder else 100,
+            key=lambda i: rank.get(i[0], 100),
         )
     )
 
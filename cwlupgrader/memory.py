@@ -0,0 +1,145 @@
+"""Per-document and per-phase memory accounting with tracemalloc."""
+
+import json
+import logging
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from .store import replace_file
+
+MEGABYTE = 1024 * 1024
+
+
+class PhaseMemory:
+    """Traced memory of a single phase of a document upgrade."""
+
+    __slots__ = ("peak", "retained")
+
+    def __init__(self) -> None:
+        """Start all counters at zero."""
+        self.peak = 0
+        self.retained = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a JSON compatible mapping."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class DocumentMemory:
+    """Traced memory of the upgrade of a single document."""
+
+    def __init__(self, path: str) -> None:
+        """Start with no recorded phases."""
+        self.path = path
+        self.size = 0
+        self.peak = 0
+        self.retained = 0
+        self.phases: dict[str, PhaseMemory] = {}
+
+    def peak_per_megabyte(self) -> float:
+        """Peak memory per MB of input text."""
+        return self.peak / max(self.size, 1) * MEGABYTE
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a JSON compatible mapping."""
+        return {
+            "path": self.path,
+            "size": self.size,
+            "peak": self.peak,
+            "retained": self.retained,
+            "peak_per_megabyte": round(self.peak_per_megabyte()),
+            "phases": {name: phase.as_dict() for name, phase in self.phases.items()},
+        }
+
+
+class MemoryReport:
+    """
+    Peak and retained memory for each document, and each phase of its upgrade.
+
+    The peak of a phase is the highest traced memory above what was allocated
+    when it started, and the retained memory is what was still allocated when
+    it ended, also relative to the start. Memory allocated by the 'run:' and
+    '$import' documents loaded while upgrading is accounted to the 'upgrade'
+    phase of the document that references them.
+    tracemalloc is process wide, so only one report may be collected at a time.
+    """
+
+    def __init__(self) -> None:
+        """Start with no recorded documents."""
+        self.documents: list[DocumentMemory] = []
+        self._current: tuple[DocumentMemory, int] | None = None
+        self._started = False
+
+    def start(self) -> None:
+        """Start tracing memory allocations, unless they already are."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """Stop tracing memory allocations, if start() started it."""
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @contextmanager
+    def document(self, path: str) -> Iterator[DocumentMemory]:
+        """Account the memory allocated in this context to a document."""
+        self.start()
+        entry = DocumentMemory(path)
+        baseline = tracemalloc.get_traced_memory()[0]
+        previous, self._current = self._current, (entry, baseline)
+        try:
+            yield entry
+        finally:
+            self._current = previous
+            entry.retained = tracemalloc.get_traced_memory()[0] - baseline
+            entry.peak = max(entry.peak, entry.retained)
+            self.documents.append(entry)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Account the memory allocated in this context to a phase."""
+        if self._current is None:
+            yield
+            return
+        entry, baseline = self._current
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            stats = entry.phases.setdefault(name, PhaseMemory())
+            stats.peak = max(stats.peak, peak - start)
+            stats.retained += current - start
+            entry.peak = max(entry.peak, peak - baseline)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the report as a JSON compatible mapping."""
+        return {
+            "peak": max((entry.peak for entry in self.documents), default=0),
+            "documents": [entry.as_dict() for entry in self.documents],
+        }
+
+    def write(self, path: str) -> None:
+        """Write the report as JSON, replacing the file atomically."""
+        replace_file(Path(path), json.dumps(self.as_dict(), indent=2) + "\n")
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log the document and phase with the highest peak memory."""
+        if not self.documents:
+            return
+        entry = max(self.documents, key=lambda entry: entry.peak)
+        phase = max(entry.phases, key=lambda name: entry.phases[name].peak, default="")
+        logger.info(
+            "Peak traced memory: %.1f MiB (%.1f MiB per MB of input) "
+            "while upgrading %s, in the %s phase.",
+            entry.peak / MEGABYTE,
+            entry.peak_per_megabyte() / MEGABYTE,
+            entry.path,
+            phase,
+        )
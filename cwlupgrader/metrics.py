@@ -0,0 +1,132 @@
+"""Per-rule hit counters and timings for the transformation helpers."""
+
+import functools
+import json
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, ParamSpec, TypeVar
+
+from .store import replace_file
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_active: ContextVar["Metrics | None"] = ContextVar("cwl_upgrader_metrics", default=None)
+
+_PROMETHEUS_COUNTERS = {
+    "calls": "Number of times the rule ran.",
+    "fired": "Number of times the rule changed the document.",
+    "nodes": "Number of document nodes rewritten by the rule.",
+    "seconds": "Cumulative time spent in the rule, including nested rules.",
+}
+
+
+class RuleStats:
+    """Counters for a single transformation rule."""
+
+    __slots__ = ("calls", "fired", "nodes", "seconds")
+
+    def __init__(self) -> None:
+        """Start all counters at zero."""
+        self.calls = 0
+        self.fired = 0
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a JSON compatible mapping."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Metrics:
+    """Counters for all the rules that ran while this collector was active."""
+
+    def __init__(self) -> None:
+        """Start with no recorded rules."""
+        self.documents = 0
+        self.rules: dict[str, RuleStats] = {}
+
+    def rule(self, name: str) -> RuleStats:
+        """Get (or create) the counters for the named rule."""
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = RuleStats()
+        return stats
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all counters as a JSON compatible mapping."""
+        return {
+            "documents": self.documents,
+            "rules": {name: self.rules[name].as_dict() for name in sorted(self.rules)},
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        lines = [
+            "# HELP cwl_upgrader_documents_total Number of documents upgraded.",
+            "# TYPE cwl_upgrader_documents_total counter",
+            f"cwl_upgrader_documents_total {self.documents}",
+        ]
+        for counter, help_text in _PROMETHEUS_COUNTERS.items():
+            metric = f"cwl_upgrader_rule_{counter}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name in sorted(self.rules):
+                value = getattr(self.rules[name], counter)
+                lines.append(f'{metric}{{rule="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, fmt: str = "json") -> None:
+        """
+        Write the counters to a file, as JSON or as a Prometheus textfile.
+
+        The file is replaced atomically, so a collector tailing it never sees
+        a partial write.
+        """
+        if fmt == "prometheus":
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.as_dict(), indent=2) + "\n"
+        replace_file(Path(path), content)
+
+
+@contextmanager
+def collect(metrics: Metrics | None) -> Iterator[Metrics | None]:
+    """Record rule metrics into the given collector (if any) for this context."""
+    token = _active.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _active.reset(token)
+
+
+def touch(rule: str, nodes: int = 1) -> None:
+    """Record that a rule fired and how many nodes it rewrote."""
+    metrics = _active.get()
+    if metrics is not None:
+        stats = metrics.rule(rule)
+        stats.fired += 1
+        stats.nodes += nodes
+
+
+def instrumented(func: Callable[P, R]) -> Callable[P, R]:
+    """Count the calls of a transformation helper and time them."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        metrics = _active.get()
+        if metrics is None:
+            return func(*args, **kwargs)
+        stats = metrics.rule(name)
+        stats.calls += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.seconds += time.perf_counter() - start
+
+    return wrapper
@@ -0,0 +1,86 @@
+"""Describe an upgrade as an RFC 6902 JSON Patch instead of a full document."""
+
+import json
+from collections.abc import MutableMapping, MutableSequence
+from typing import Any
+
+
+def snapshot(node: Any) -> Any:
+    """
+    Copy the containers of a loaded document into plain dicts and lists.
+
+    The transformations edit the document in place, so this is taken before
+    upgrading; scalars are immutable and are shared, not copied.
+    """
+    if isinstance(node, MutableMapping):
+        return {key: snapshot(value) for key, value in node.items()}
+    if isinstance(node, MutableSequence):
+        return [snapshot(entry) for entry in node]
+    return node
+
+
+def _pointer(path: str, key: Any) -> str:
+    """Extend a JSON Pointer with one more (escaped) reference token."""
+    return path + "/" + str(key).replace("~", "~0").replace("/", "~1")
+
+
+def make_patch(before: Any, after: Any, path: str = "") -> list[dict[str, Any]]:
+    """
+    Compute the JSON Patch that turns ``before`` into ``after``.
+
+    Unchanged subtrees are skipped with a single equality check, and key order
+    is ignored, so re-sorting a mapping does not produce any operations.
+    A key whose value moved to a new key (like 'description' to 'doc')
+    becomes a single "move" operation.
+    """
+    if isinstance(before, MutableMapping) and isinstance(after, MutableMapping):
+        ops: list[dict[str, Any]] = []
+        removed = [key for key in before if key not in after]
+        added = [key for key in after if key not in before]
+        for key in before:
+            if key in after and before[key] != after[key]:
+                ops.extend(make_patch(before[key], after[key], _pointer(path, key)))
+        for key in added:
+            for old_key in removed:
+                if before[old_key] == after[key]:
+                    removed.remove(old_key)
+                    ops.append(
+                        {
+                            "op": "move",
+                            "from": _pointer(path, old_key),
+                            "path": _pointer(path, key),
+                        }
+                    )
+                    break
+            else:
+                ops.append(
+                    {
+                        "op": "add",
+                        "path": _pointer(path, key),
+                        "value": snapshot(after[key]),
+                    }
+                )
+        for key in removed:
+            ops.insert(0, {"op": "remove", "path": _pointer(path, key)})
+        return ops
+    if isinstance(before, MutableSequence) and isinstance(after, MutableSequence):
+        ops = []
+        common = min(len(before), len(after))
+        for index in range(common):
+            if before[index] != after[index]:
+                ops.extend(make_patch(before[index], after[index], f"{path}/{index}"))
+        for index in range(len(before) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+        for index in range(common, len(after)):
+            ops.append(
+                {"op": "add", "path": f"{path}/-", "value": snapshot(after[index])}
+            )
+        return ops
+    if before == after and isinstance(before, bool) == isinstance(after, bool):
+        return []
+    return [{"op": "replace", "path": path, "value": snapshot(after)}]
+
+
+def format_patch(patch: list[dict[str, Any]]) -> str:
+    """Serialize a JSON Patch."""
+    return json.dumps(patch, indent=2) + "\n"
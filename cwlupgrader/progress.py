@@ -0,0 +1,257 @@
+"""Live progress and throughput of a batch upgrade, on a terminal and as JSON lines."""
+
+import json
+import os
+import threading
+import time
+import weakref
+from collections.abc import Iterable
+from types import TracebackType
+from typing import Any, TextIO
+
+from .memory import MEGABYTE
+
+REPORT_INTERVAL = 1.0
+"""Seconds between two progress reports."""
+
+
+_streams: "weakref.WeakSet[StatusStream]" = weakref.WeakSet()
+
+
+def _after_fork() -> None:
+    """
+    Reset the status streams in a forked child.
+
+    The reporting thread, which may hold their locks, isn't running in the
+    child, and only the parent draws the status line: the child clears it
+    before its own output, and the parent draws it again at its next report.
+    """
+    for stream in _streams:
+        stream._lock = threading.Lock()
+        stream.status = ""
+        stream._forked = True
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as hours, minutes and seconds, like '1h02m03s'."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class StatusStream:
+    """
+    Keep a status line at the bottom of a terminal, below the other output.
+
+    Whatever is written through this stream (typically by a logging handler)
+    first erases the status line, which is drawn again after every complete
+    line of output.
+    """
+
+    def __init__(self, terminal: TextIO) -> None:
+        """Wrap the terminal stream."""
+        self.terminal = terminal
+        self.status = ""
+        self._lock = threading.Lock()
+        self._forked = False
+        _streams.add(self)
+
+    def _draw(self) -> None:
+        if self.status:
+            self.terminal.write(self.status)
+        self.terminal.flush()
+
+    def write(self, text: str) -> int:
+        """Write text above the status line."""
+        with self._lock:
+            if self.status or self._forked:
+                self.terminal.write("\r\x1b[K")
+            self.terminal.write(text)
+            if text.endswith("\n"):
+                self._draw()
+        return len(text)
+
+    def flush(self) -> None:
+        """Flush the terminal stream."""
+        with self._lock:
+            self.terminal.flush()
+
+    def show(self, status: str) -> None:
+        """Replace the status line."""
+        with self._lock:
+            self.terminal.write("\r\x1b[K")
+            self.status = status
+            self._draw()
+
+    def close(self) -> None:
+        """Leave the last status on its own line."""
+        with self._lock:
+            if self.status:
+                self.terminal.write("\n")
+                self.terminal.flush()
+            self.status = ""
+
+
+class Progress:
+    """
+    Track the documents of a batch, and report the progress periodically.
+
+    The upgrade loop only calls start() and finish() for each document,
+    which update a few counters; the rates, queue depth, documents in flight
+    and estimated time left are computed and reported by a background thread,
+    every interval seconds, to a StatusStream on a terminal and/or as JSON
+    lines appended to a file. The estimate assumes the remaining documents
+    upgrade at the same rate, in bytes per second, as the finished ones.
+    """
+
+    def __init__(
+        self,
+        inputs: Iterable[str],
+        status: StatusStream | None = None,
+        path: str | None = None,
+        interval: float = REPORT_INTERVAL,
+    ) -> None:
+        """Measure the inputs; reporting starts when entering the context."""
+        paths = list(inputs)
+        self.sizes = {path: _size(path) for path in paths}
+        self.total = len(paths)
+        self.bytes_total = sum(self.sizes[path] for path in paths)
+        self.status = status
+        self.path = path
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self.in_flight: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._output: TextIO | None = None
+        self._started = time.monotonic()
+
+    def start(self, path: str) -> None:
+        """Record that a document started upgrading."""
+        with self._lock:
+            self.in_flight[path] = time.monotonic()
+
+    def finish(self, path: str, failed: bool = False) -> None:
+        """Record that a document was upgraded, or failed to."""
+        with self._lock:
+            self.in_flight.pop(path, None)
+            self.done += 1
+            self.failed += failed
+            self.bytes_done += self.sizes.get(path, 0)
+
+    def snapshot(self) -> dict[str, Any]:
+        """The current progress, as a JSON compatible mapping."""
+        now = time.monotonic()
+        with self._lock:
+            done, failed, bytes_done = self.done, self.failed, self.bytes_done
+            in_flight = self.in_flight.copy()
+        elapsed = now - self._started
+        total = self.total
+        files_per_second = done / elapsed if elapsed > 0 else 0.0
+        bytes_per_second = bytes_done / elapsed if elapsed > 0 else 0.0
+        if done == total:
+            eta: float | None = 0.0
+        elif bytes_per_second > 0:
+            eta = (self.bytes_total - bytes_done) / bytes_per_second
+        elif files_per_second > 0:
+            eta = (total - done) / files_per_second
+        else:
+            eta = None
+        return {
+            "time": time.time(),
+            "elapsed": round(elapsed, 3),
+            "files_done": done,
+            "files_failed": failed,
+            "files_total": total,
+            "bytes_done": bytes_done,
+            "bytes_total": self.bytes_total,
+            "files_per_second": round(files_per_second, 3),
+            "megabytes_per_second": round(bytes_per_second / MEGABYTE, 3),
+            "queue": total - done - len(in_flight),
+            "in_flight": [
+                {"path": path, "seconds": round(now - started, 3)}
+                for path, started in sorted(in_flight.items(), key=lambda item: item[1])
+            ],
+            "eta": None if eta is None else round(eta, 3),
+        }
+
+    @staticmethod
+    def render(snapshot: dict[str, Any]) -> str:
+        """Summarize a snapshot on a single line."""
+        total = snapshot["files_total"]
+        percent = snapshot["files_done"] / total * 100 if total else 100.0
+        line = (
+            f"{snapshot['files_done']}/{total} files ({percent:.1f}%), "
+            f"{snapshot['files_per_second']:.1f} files/s, "
+            f"{snapshot['megabytes_per_second']:.2f} MiB/s, "
+            f"{snapshot['queue']} queued"
+        )
+        if snapshot["files_failed"]:
+            line += f", {snapshot['files_failed']} failed"
+        if snapshot["eta"] is not None:
+            line += f", ETA {format_duration(snapshot['eta'])}"
+        if snapshot["in_flight"]:
+            oldest = snapshot["in_flight"][0]
+            line += f" - {oldest['path']} ({format_duration(oldest['seconds'])})"
+            if len(snapshot["in_flight"]) > 1:
+                line += f" and {len(snapshot['in_flight']) - 1} more"
+        return line
+
+    def report(self) -> None:
+        """Report the current progress to the terminal and the file."""
+        snapshot = self.snapshot()
+        if self.status is not None:
+            self.status.show(self.render(snapshot))
+        if self._output is not None:
+            self._output.write(json.dumps(snapshot) + "\n")
+            self._output.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def __enter__(self) -> "Progress":
+        """Start reporting in a background thread."""
+        self._started = time.monotonic()
+        if self.path is not None:
+            self._output = open(self.path, "a")
+        self.report()
+        self._thread = threading.Thread(
+            target=self._run, name="cwl-upgrader-progress", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Stop reporting, after a final report."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
+        if self.status is not None:
+            self.status.close()
+        if self._output is not None:
+            self._output.close()
+            self._output = None
@@ -0,0 +1,240 @@
+"""Deterministic, cost-aware partitioning of the inputs across CI shards."""
+
+import argparse
+import json
+import os
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any
+
+import ruamel.yaml
+from ruamel.yaml.error import YAMLError
+
+STEP_COST = 4096
+"""Estimated cost of upgrading a workflow step, in bytes of document text."""
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parse a 1-based 'index/count' shard specification."""
+    index, _, count = spec.partition("/")
+    try:
+        shard, shards = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard {spec!r}, expected 'INDEX/COUNT'"
+        ) from None
+    if not 1 <= shard <= shards:
+        raise argparse.ArgumentTypeError(
+            f"invalid shard {spec!r}, INDEX must be between 1 and COUNT"
+        )
+    return shard, shards
+
+
+def resolve_reference(value: str, base: str) -> str | None:
+    """Resolve a 'run:' or '$import' reference that will be upgraded too."""
+    if "#" in value or "://" in value:
+        return None
+    return os.path.abspath(os.path.join(base, value))
+
+
+def scan(path: str) -> tuple[int, list[str]]:
+    """
+    Estimate the cost of upgrading a document and find the files it references.
+
+    The cost is the size of the file plus STEP_COST for every workflow step,
+    including those of inline subworkflows. Only the 'run:' and '$import'
+    references that the upgrade writes out as separate files are returned.
+    """
+    try:
+        cost = os.path.getsize(path)
+        with open(path) as handle:
+            loader = ruamel.yaml.YAML(typ="safe", pure=True)
+            loader.allow_duplicate_keys = True
+            document = loader.load(handle)
+    except (OSError, YAMLError):
+        return 0, []
+    base = os.path.dirname(path)
+    references: list[str] = []
+    pending = [document]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            steps = node.get("steps")
+            if isinstance(steps, (dict, list)):
+                cost += STEP_COST * len(steps)
+            for key, value in node.items():
+                if key in ("run", "$import") and isinstance(value, str):
+                    reference = resolve_reference(value, base)
+                    if reference is not None:
+                        references.append(reference)
+                else:
+                    pending.append(value)
+        elif isinstance(node, list):
+            pending.extend(node)
+    return cost, references
+
+
+def group_inputs(
+    inputs: Sequence[str],
+    scanner: Callable[[str], tuple[int, list[str]]] = scan,
+) -> list[tuple[int, list[str]]]:
+    """
+    Group the inputs that would write the same output file, with their cost.
+
+    A workflow is grouped with the 'run:' and '$import' documents it
+    references (transitively), and with any documents with the same file
+    name, as they are all written to the same output directory.
+    The costs and references are found by the scanner, scan() by default.
+    The groups are sorted largest first, ties broken by path, and the inputs
+    of each group keep their order.
+    """
+    parent: dict[str, str] = {}
+
+    def find(node: str) -> str:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(first: str, second: str) -> None:
+        first, second = find(first), find(second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    costs: dict[str, int] = {}
+    by_name: dict[str, str] = {}
+    pending = sorted({os.path.abspath(path) for path in inputs})
+    while pending:
+        node = pending.pop()
+        if node in costs:
+            continue
+        parent.setdefault(node, node)
+        costs[node], references = scanner(node)
+        union(node, by_name.setdefault(os.path.basename(node), node))
+        for reference in references:
+            parent.setdefault(reference, reference)
+            union(node, reference)
+            pending.append(reference)
+
+    groups: dict[str, list[str]] = {}
+    group_costs: dict[str, int] = {}
+    for node, cost in costs.items():
+        root = find(node)
+        groups.setdefault(root, [])
+        group_costs[root] = group_costs.get(root, 0) + cost
+    for path in inputs:
+        groups[find(os.path.abspath(path))].append(path)
+    return [
+        (group_costs[root], groups[root])
+        for root in sorted(groups, key=lambda root: (-group_costs[root], root))
+        if groups[root]
+    ]
+
+
+def plan_shards(inputs: Sequence[str], count: int) -> list[list[str]]:
+    """
+    Split the inputs into count shards of about the same estimated cost.
+
+    Documents that would write the same output file are kept in the same
+    shard, see group_inputs().
+    Groups are assigned largest first to the least loaded shard, and all ties
+    are broken by path, so every CI node computes the same plan from the same
+    list of inputs, whatever its order.
+    """
+    loads = [0] * count
+    shards: list[list[str]] = [[] for _ in range(count)]
+    for cost, group in group_inputs(inputs):
+        target = min(range(count), key=lambda index: (loads[index], index))
+        loads[target] += cost
+        shards[target].extend(group)
+    order = {path: index for index, path in enumerate(inputs)}
+    return [sorted(shard, key=order.__getitem__) for shard in shards]
+
+
+def write_manifest(
+    path: str,
+    shard: int,
+    shards: int,
+    inputs: Iterable[str],
+    outputs: Iterable[str],
+    invalid: dict[str, str] | None = None,
+    failed: dict[str, str] | None = None,
+) -> None:
+    """
+    Record what a single shard upgraded and wrote.
+
+    invalid maps the documents that failed validation, and failed those that
+    couldn't be upgraded (with --isolate), to the reason.
+    """
+    manifest: dict[str, Any] = {
+        "shard": shard,
+        "shards": shards,
+        "inputs": list(inputs),
+        "outputs": sorted(set(outputs)),
+    }
+    if invalid is not None:
+        manifest["invalid"] = invalid
+    if failed is not None:
+        manifest["failed"] = failed
+    with open(path, "w") as handle:
+        json.dump(manifest, handle, indent=2)
+        handle.write("\n")
+
+
+def merge_manifests(paths: Iterable[str]) -> dict[str, Any]:
+    """
+    Combine the manifests of all the shards of a run into a single report.
+
+    The report lists the shards that are missing, the outputs written by
+    more than one shard, and the documents that were invalid or failed;
+    none of them should happen for a complete run.
+    """
+    counts: set[int] = set()
+    seen: dict[int, str] = {}
+    inputs: list[str] = []
+    writers: dict[str, list[int]] = {}
+    invalid: dict[str, str] = {}
+    failed: dict[str, str] = {}
+    duplicates: list[int] = []
+    for path in paths:
+        with open(path) as handle:
+            manifest = json.load(handle)
+        shard = manifest["shard"]
+        counts.add(manifest["shards"])
+        if shard in seen:
+            duplicates.append(shard)
+        seen[shard] = path
+        inputs.extend(manifest["inputs"])
+        for output in manifest["outputs"]:
+            writers.setdefault(output, []).append(shard)
+        invalid.update(manifest.get("invalid", {}))
+        failed.update(manifest.get("failed", {}))
+    shards = max(counts, default=0)
+    return {
+        "shards": shards,
+        "inconsistent_shard_counts": len(counts) > 1,
+        "missing_shards": [
+            shard for shard in range(1, shards + 1) if shard not in seen
+        ],
+        "duplicate_shards": sorted(set(duplicates)),
+        "inputs": inputs,
+        "outputs": sorted(writers),
+        "conflicts": {
+            output: sorted(writer_shards)
+            for output, writer_shards in sorted(writers.items())
+            if len(writer_shards) > 1
+        },
+        "invalid": invalid,
+        "failed": failed,
+    }
+
+
+def merge_failed(report: dict[str, Any]) -> bool:
+    """Check if a merged report shows an incomplete, conflicting or failed run."""
+    return bool(
+        report["inconsistent_shard_counts"]
+        or report["missing_shards"]
+        or report["duplicate_shards"]
+        or report["conflicts"]
+        or report["invalid"]
+        or report["failed"]
+    )
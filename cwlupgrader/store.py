@@ -0,0 +1,148 @@
+"""Content-addressed store of upgraded documents, shared through hard links."""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+from . import __version__
+
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+_EXECUTE_BITS = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+
+def temporary_path(path: Path) -> Path:
+    """A temporary name next to path, unique to this process and thread."""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def replace_file(path: Path, content: str, executable: bool = False) -> None:
+    """
+    Replace path with a file holding content, atomically.
+
+    The content is written to a temporary_path() and renamed over path, so
+    readers never see a partial file, concurrent writers don't share a
+    temporary file, and an existing file hard linked elsewhere is left alone.
+    """
+    temporary = temporary_path(path)
+    try:
+        temporary.write_text(content)
+        if executable:
+            temporary.chmod(temporary.stat().st_mode | _EXECUTE_BITS)
+        os.replace(temporary, path)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+
+def _digest(data: bytes, executable: bool) -> str:
+    """The digest of an output and its executable bit."""
+    return hashlib.sha256(data + (b"\0x" if executable else b"\0")).hexdigest()
+
+
+class OutputStore:
+    """
+    Keep every distinct output once, and link it into each destination.
+
+    Outputs are stored as read-only blobs named after the SHA-256 of their
+    content and executable bit. Destinations are hard links to the blobs
+    (copies, where the file system doesn't allow links), and the upgrades
+    replace their outputs instead of writing through them. A blob that was
+    modified anyway (through a link, by someone ignoring its permissions) no
+    longer matches its digest, so it is never reused, and stored again the
+    next time its content is written.
+    The upgrades of standalone documents are also recorded in an index, keyed
+    by the source text and the upgrade options, so that each distinct source
+    is upgraded only once, even across runs and processes.
+    """
+
+    def __init__(self, root: str) -> None:
+        """Use (and create if needed) the store in the root directory."""
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.index = self.root / "index"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.index.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+
+    @staticmethod
+    def key(text: str, options: Iterable[object]) -> str:
+        """Key the upgrade of a source text with the given options."""
+        digest = hashlib.sha256(f"cwl-upgrader {__version__}\n".encode())
+        digest.update(json.dumps(list(options)).encode())
+        digest.update(b"\n")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def _blob(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / digest[2:]
+
+    def put(self, content: str, executable: bool) -> str:
+        """Store an output, unless it already is, and return its digest."""
+        data = content.encode()
+        digest = _digest(data, executable)
+        if self.get(digest) is None:
+            blob = self._blob(digest)
+            blob.parent.mkdir(exist_ok=True)
+            temporary = temporary_path(blob)
+            temporary.write_bytes(data)
+            mode = temporary.stat().st_mode & ~_WRITE_BITS
+            temporary.chmod(mode | _EXECUTE_BITS if executable else mode)
+            os.replace(temporary, blob)
+        return digest
+
+    def materialize(self, digest: str, destination: Path) -> None:
+        """Make destination a hard link to (or a copy of) the stored output."""
+        blob = self._blob(digest)
+        try:
+            if os.path.samefile(blob, destination):
+                return
+        except OSError:
+            pass
+        temporary = temporary_path(destination)
+        try:
+            try:
+                os.link(blob, temporary)
+            except OSError:  # across file systems, or not supported
+                shutil.copy2(blob, temporary)
+            os.replace(temporary, destination)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+
+    def write(self, path: Path, content: str, executable: bool) -> None:
+        """Output sink storing the content and linking it into place."""
+        self.materialize(self.put(content, executable), path)
+
+    def get(self, digest: str) -> tuple[str, bool] | None:
+        """
+        Read a stored output, and whether it is executable.
+
+        Returns None if the blob is missing, or doesn't match its digest.
+        """
+        blob = self._blob(digest)
+        try:
+            data = blob.read_bytes()
+            executable = bool(blob.stat().st_mode & stat.S_IXUSR)
+        except OSError:
+            return None
+        if _digest(data, executable) != digest:
+            return None
+        return data.decode(), executable
+
+    def lookup(self, key: str) -> str | None:
+        """Find the digest of the intact, recorded upgrade of a source, if any."""
+        entry = self.index / key
+        try:
+            digest = entry.read_text().strip()
+        except OSError:
+            return None
+        return digest if self.get(digest) is not None else None
+
+    def record(self, key: str, digest: str) -> None:
+        """Record the output of the upgrade of a standalone source."""
+        replace_file(self.index / key, digest + "\n")
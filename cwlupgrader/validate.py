@@ -0,0 +1,96 @@
+"""In-memory validation of upgraded CWL documents."""
+
+import functools
+import importlib
+import importlib.util
+import logging
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from schema_salad.exceptions import ValidationException
+from schema_salad.runtime import LoadingOptions
+from schema_salad.sourceline import add_lc_filename
+
+_logger = logging.getLogger("cwl-upgrader")  # pylint: disable=invalid-name
+
+_PARSERS = {
+    "v1.0": "cwl_utils.parser.cwl_v1_0",
+    "v1.1": "cwl_utils.parser.cwl_v1_1",
+    "v1.2": "cwl_utils.parser.cwl_v1_2",
+}
+
+
+def validation_supported() -> bool:
+    """Report if the optional cwl-utils dependency is installed."""
+    return importlib.util.find_spec("cwl_utils") is not None
+
+
+@functools.cache
+def load_schema(version: str) -> tuple[ModuleType, LoadingOptions]:
+    """
+    Load the schema_salad generated parser for the given cwlVersion.
+
+    The result is cached, so each schema is only loaded once per process;
+    the shared LoadingOptions also keeps a single fetcher for all documents.
+    """
+    module = importlib.import_module(_PARSERS[version])
+    return module, LoadingOptions(no_link_check=True)
+
+
+def validate_document(document: Any, path: str) -> str | None:
+    """
+    Validate an upgraded document against the schema of its cwlVersion.
+
+    ``path`` is where the document will be written, so that any '$import'
+    is resolved against the already upgraded copies.
+    Returns None if the document is valid, otherwise the validation error.
+    """
+    version = document.get("cwlVersion")
+    if version not in _PARSERS:
+        return f"Unsupported cwlVersion for validation: {version}"
+    module, base_options = load_schema(version)
+    uri = Path(path).resolve().as_uri()
+    filename = getattr(document.lc, "filename", None)
+    try:
+        module.load_document_by_yaml(
+            document, uri, LoadingOptions(copyfrom=base_options, fileuri=uri, idx={})
+        )
+    except ValidationException as exc:
+        return str(exc)
+    finally:
+        if filename is not None:
+            # the parser re-labels the document with the validation URI
+            add_lc_filename(document, filename)
+    return None
+
+
+class ValidationReport:
+    """Aggregated validation results for a batch of documents."""
+
+    def __init__(self, logger: logging.Logger | None = None) -> None:
+        """Start with an empty report."""
+        self.logger = logger if logger is not None else _logger
+        self.valid: list[str] = []
+        self.invalid: dict[str, str] = {}
+
+    def check(self, document: Any, source: str, destination: str) -> bool:
+        """Validate a single upgraded document and record the outcome."""
+        error = validate_document(document, destination)
+        if error is None:
+            self.valid.append(source)
+            return True
+        self.logger.error("Upgraded version of %s is not valid:\n%s", source, error)
+        self.invalid[source] = error
+        return False
+
+    def log_summary(self) -> None:
+        """Log the totals and the list of invalid documents."""
+        self.logger.info(
+            "Validated %d document(s): %d valid, %d invalid.",
+            len(self.valid) + len(self.invalid),
+            len(self.valid),
+            len(self.invalid),
+        )
+        for source in self.invalid:
+            self.logger.error("Invalid after upgrade: %s", source)
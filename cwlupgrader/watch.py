@@ -0,0 +1,118 @@
+"""Upgrade the inputs again when they, or the documents they reference, change."""
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .main import Upgrader
+
+POLL_INTERVAL = 0.1
+"""Seconds between two checks of the watched files."""
+
+
+def _version(path: str) -> tuple[int, int] | None:
+    """The modification time and size of a file, or None if it is missing."""
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return status.st_mtime_ns, status.st_size
+
+
+class Watcher:
+    """
+    Poll the inputs and their dependencies, and upgrade what changed.
+
+    The dependencies of an input are all the 'run:' and '$import' documents
+    read while upgrading it, so they are discovered again on every upgrade.
+    Only the inputs that changed, or depend on a file that changed, are
+    upgraded again; the Upgrader should have its cache enabled, so that the
+    other documents are not parsed again.
+    """
+
+    def __init__(
+        self,
+        upgrader: "Upgrader",
+        inputs: Sequence[str],
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """Start watching after a first upgrade of the inputs."""
+        self.upgrader = upgrader
+        self.inputs = list(inputs)
+        self.logger = logger if logger is not None else upgrader.logger
+        self.versions: dict[str, tuple[int, int] | None] = {}
+        self._record(self.watched())
+
+    def watched(self) -> set[str]:
+        """The absolute paths of the inputs and all their dependencies."""
+        paths = {os.path.abspath(path) for path in self.inputs}
+        for path in list(paths):
+            paths |= self.upgrader.dependencies.get(path, set())
+        return paths
+
+    def _record(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            self.versions[path] = _version(path)
+
+    def changed(self) -> set[str]:
+        """Find the watched files that changed since the last check."""
+        changed = {
+            path for path in self.watched() if _version(path) != self.versions.get(path)
+        }
+        self._record(changed)
+        return changed
+
+    def affected(self, changed: set[str]) -> list[str]:
+        """The inputs that changed, or depend on a file that changed."""
+        dependencies = self.upgrader.dependencies
+        return [
+            path
+            for path in self.inputs
+            if os.path.abspath(path) in changed
+            or not changed.isdisjoint(dependencies.get(os.path.abspath(path), ()))
+        ]
+
+    def poll(self) -> list[str]:
+        """Upgrade again the inputs affected by the changes since the last poll."""
+        affected = self.affected(self.changed())
+        if not affected:
+            return affected
+        start = time.perf_counter()
+        written = len(self.upgrader.written)
+        for path in affected:
+            # upgrade the '$import's again too, they might have changed
+            self.upgrader.imports.clear()
+            try:
+                self.upgrader.upgrade_file(path)
+            except Exception:  # keep watching while the document is edited
+                self.logger.exception("Failed to upgrade %s", path)
+        watched = self.watched()
+        outputs = {os.path.abspath(path) for path in self.upgrader.written[written:]}
+        # don't react to our own outputs when upgrading in place, and start
+        # watching the newly referenced documents
+        self._record(
+            path for path in watched if path in outputs or path not in self.versions
+        )
+        self.logger.info(
+            "Upgraded %d document(s) in %.0f ms, watching %d file(s).",
+            len(affected),
+            (time.perf_counter() - start) * 1000,
+            len(self.versions),
+        )
+        return affected
+
+    def run(
+        self, interval: float = POLL_INTERVAL, stop: threading.Event | None = None
+    ) -> None:
+        """Poll until stopped, or interrupted with Control-C."""
+        stop = stop if stop is not None else threading.Event()
+        self.logger.info("Watching %d file(s) for changes.", len(self.versions))
+        try:
+            while not stop.wait(interval):
+                self.poll()
+        except KeyboardInterrupt:
+            pass
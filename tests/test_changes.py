@@ -0,0 +1,105 @@
+"""Tests for the --since option."""
+
+import shutil
+import subprocess  # nosec
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.changes import select_changed
+from cwlupgrader.main import main
+
+from .util import get_data
+
+
+def git(repository: Path, *args: str) -> None:
+    """Run a git command in the test repository."""
+    subprocess.run(  # nosec
+        [
+            "git",
+            "-C",
+            str(repository),
+            "-c",
+            "user.name=Test",
+            "-c",
+            "user.email=test@example.com",
+            *args,
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repository(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A git repository with a workflow, its tools, and a standalone tool."""
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    repository = tmp_path / "repository"
+    (repository / "tools").mkdir(parents=True)
+    shutil.copy(get_data("testdata/v1.0/1st-workflow.cwl"), repository)
+    for name in ("arguments.cwl", "tar-param.cwl"):
+        shutil.copy(get_data(f"testdata/v1.0/{name}"), repository)
+    shutil.copy(get_data("testdata/v1.0/networkaccess.cwl"), repository / "tools")
+    git(repository, "init", "-q")
+    git(repository, "add", ".")
+    git(repository, "commit", "-q", "-m", "initial")
+    monkeypatch.chdir(repository)
+    return repository
+
+
+INPUTS = [
+    "1st-workflow.cwl",
+    "arguments.cwl",
+    "tar-param.cwl",
+    "tools/networkaccess.cwl",
+]
+
+
+def upgraded(out_dir: Path) -> list[str]:
+    """The names of the upgraded documents."""
+    return sorted(path.name for path in out_dir.iterdir())
+
+
+def test_since(repository: Path, tmp_path: Path) -> None:
+    """A changed tool is upgraded, with the workflow that runs it."""
+    out_dir = tmp_path / "out"
+    assert main([f"--dir={out_dir}", "--since=HEAD", *INPUTS]) == 0
+    assert upgraded(out_dir) == []
+
+    tool = repository / "arguments.cwl"
+    tool.write_text(tool.read_text().replace("Java 9", "Java 11"))
+    git(repository, "commit", "-q", "-am", "edit")
+    (repository / "tools" / "new.cwl").write_text(
+        (repository / "tools" / "networkaccess.cwl").read_text()
+    )
+    assert main([f"--dir={out_dir}", "--since=HEAD~1", *INPUTS, "tools/new.cwl"]) == 0
+    assert upgraded(out_dir) == [
+        "1st-workflow.cwl",
+        "arguments.cwl",
+        "new.cwl",
+        "tar-param.cwl",
+    ]
+
+
+def test_since_unknown_revision(repository: Path, tmp_path: Path) -> None:
+    """A revision that git doesn't know is an error."""
+    assert main([f"--dir={tmp_path}", "--since=no-such-revision", *INPUTS]) == 1
+
+
+def test_select_changed_cycle(tmp_path: Path) -> None:
+    """Documents in a reference cycle see the changes beyond it."""
+    # a runs b and c, b runs a; b is reached from a before c is
+    for name, runs in {"a": ["c", "b"], "b": ["a"], "c": []}.items():
+        steps = "".join(
+            f"  {run}:\n    run: {run}.cwl\n    in: []\n    out: []\n" for run in runs
+        )
+        (tmp_path / f"{name}.cwl").write_text(
+            "cwlVersion: v1.0\nclass: Workflow\ninputs: []\noutputs: []\n"
+            + (f"steps:\n{steps}" if steps else "steps: []\n")
+        )
+    inputs = [str(tmp_path / f"{name}.cwl") for name in ("a", "b", "c")]
+    changed = {str((tmp_path / "c.cwl").resolve())}
+    assert select_changed(inputs, changed) == inputs
+    assert select_changed(inputs[::-1], changed) == inputs[::-1]
+    assert select_changed(inputs[:2], set()) == []
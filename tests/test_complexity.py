@@ -0,0 +1,89 @@
+"""Check that upgrade time and memory grow roughly linearly with document size."""
+
+import math
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from schema_salad.sourceline import cmap
+
+from cwlupgrader.main import upgrade_document
+
+from .util import (
+    generate_draft3_workflow,
+    generate_v1_0_nested_workflow,
+    generate_v1_0_tool,
+    generate_v1_0_workflow,
+)
+
+REPEATS = 5
+MAX_TIME_EXPONENT = 1.4
+MAX_MEMORY_EXPONENT = 1.2
+
+
+def fitted_exponent(sizes: list[int], values: list[float]) -> float:
+    """Least squares slope of log(value) over log(size)."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in values]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    covariance = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+    variance = sum((x - x_mean) ** 2 for x in xs)
+    return covariance / variance
+
+
+def measure(source: dict[str, Any], target: str, out_dir: Path) -> tuple[float, int]:
+    """Best CPU time over a few runs, and the peak traced memory, of one upgrade."""
+    filename = str(out_dir / "generated.cwl")
+    best = math.inf
+    for _ in range(REPEATS):
+        document = cmap(source, fn=filename)
+        start = time.process_time()
+        upgrade_document(document, str(out_dir), target)
+        best = min(best, time.process_time() - start)
+    document = cmap(source, fn=filename)
+    tracemalloc.start()
+    try:
+        upgrade_document(document, str(out_dir), target)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+@pytest.mark.parametrize(
+    ("generator", "sizes", "target"),
+    [
+        pytest.param(generate_v1_0_workflow, [32, 64, 128, 256], "latest", id="steps"),
+        pytest.param(generate_v1_0_tool, [128, 256, 512, 1024], "latest", id="inputs"),
+        pytest.param(
+            generate_v1_0_nested_workflow, [8, 16, 32, 64], "latest", id="depth"
+        ),
+        pytest.param(
+            generate_draft3_workflow, [64, 128, 256, 512], "v1.0", id="draft3"
+        ),
+    ],
+)
+def test_linear_growth(
+    tmp_path: Path,
+    generator: Callable[[int], dict[str, Any]],
+    sizes: list[int],
+    target: str,
+) -> None:
+    """Doubling the document size should roughly double the cost."""
+    times: list[float] = []
+    peaks: list[float] = []
+    for size in sizes:
+        elapsed, peak = measure(generator(size), target, tmp_path)
+        times.append(elapsed)
+        peaks.append(peak)
+    time_exponent = fitted_exponent(sizes, times)
+    memory_exponent = fitted_exponent(sizes, peaks)
+    assert time_exponent < MAX_TIME_EXPONENT, f"runtime grows as n^{time_exponent:.2f}"
+    assert (
+        memory_exponent < MAX_MEMORY_EXPONENT
+    ), f"peak memory grows as n^{memory_exponent:.2f}"
@@ -0,0 +1,100 @@
+"""Tests for the draft-3 'path' to 'location' expression rewriting."""
+
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.expressions import rewrite_path_to_location
+from cwlupgrader.main import Upgrader, load_cwl_document
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("$(self.path)", "$(self.location)"),
+        ("$(inputs.reads.path).bai", "$(inputs.reads.location).bai"),
+        ('$(self["path"])', '$(self["location"])'),
+        (
+            "${ return {path: self.path + '.idx'}; }",
+            "${ return {location: self.location + '.idx'}; }",
+        ),
+        (
+            '${ return {"class": "File", "path": p}; }',
+            '${ return {"class": "File", "location": p}; }',
+        ),
+        # an input named 'path'
+        ("$(inputs.path)", "$(inputs.path)"),
+        ('$(inputs["path"].basename)', '$(inputs["path"].basename)'),
+        # string literals, plain text, escapes and comments are kept
+        ("$(self.basename + '.path')", "$(self.basename + '.path')"),
+        ("my.path/$(self.path)", "my.path/$(self.location)"),
+        ("\\$(self.path)", "\\$(self.path)"),
+        (
+            "${ /* self.path */ return x ? path : 1; }",
+            "${ /* self.path */ return x ? path : 1; }",
+        ),
+        ("$(self.nameroot)", "$(self.nameroot)"),
+    ],
+)
+def test_rewrite_path_to_location(text: str, expected: str) -> None:
+    assert rewrite_path_to_location(text) == expected
+
+
+def test_rewrite_all_expressions(tmp_path: Path) -> None:
+    """With rewrite_expression_paths, outputEval and valueFrom are rewritten too."""
+    source = tmp_path / "tool.cwl"
+    source.write_text("""#!/usr/bin/env cwl-runner
+cwlVersion: draft-3
+class: CommandLineTool
+baseCommand: cat
+requirements:
+  - class: InlineJavascriptRequirement
+inputs:
+  - id: reads
+    type: File
+    inputBinding:
+      valueFrom: $(self.path)
+outputs:
+  - id: out
+    type: string
+    outputBinding:
+      glob: out.txt
+      outputEval: $(self[0].path)
+""")
+    outputs: dict[str, str] = {}
+
+    def sink(path: Path, content: str, executable: bool) -> None:
+        outputs[path.name] = content
+
+    Upgrader(str(tmp_path), "v1.0", sink=sink).upgrade_file(str(source))
+    assert "$(self.path)" in outputs["tool.cwl"]
+    Upgrader(
+        str(tmp_path), "v1.0", rewrite_expression_paths=True, sink=sink
+    ).upgrade_file(str(source))
+    assert "$(self.location)" in outputs["tool.cwl"]
+    assert "$(self[0].location)" in outputs["tool.cwl"]
+    assert ".path" not in outputs["tool.cwl"]
+
+
+def test_secondary_files(tmp_path: Path) -> None:
+    """secondaryFiles expressions are always rewritten, without the option."""
+    source = tmp_path / "tool.cwl"
+    source.write_text("""cwlVersion: draft-3
+class: CommandLineTool
+baseCommand: cat
+inputs:
+  - id: bam
+    type: File
+    secondaryFiles:
+      - .bai
+      - $(self.path.replace(/bam$/, 'idx'))
+outputs: []
+""")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    Upgrader(str(out_dir), "v1.0").upgrade_file(str(source))
+    upgraded = load_cwl_document(str(out_dir / "tool.cwl"))
+    assert upgraded["inputs"]["bam"]["secondaryFiles"] == [
+        ".bai",
+        "$(self.location.replace(/bam$/, 'idx'))",
+    ]
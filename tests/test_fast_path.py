@@ -0,0 +1,80 @@
+"""Tests for upgrading documents that only need a new cwlVersion."""
+
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.main import (
+    load_cwl_document,
+    main,
+    needs_only_version_bump,
+    upgrade_document,
+)
+from cwlupgrader.patch import snapshot
+
+from .util import get_data, get_path
+
+V1_0_IDIOMATIC_TOOL = """\
+#!/usr/bin/env cwl-runner
+cwlVersion: v1.0  # keep this comment
+class: CommandLineTool
+requirements:
+  NetworkAccess:
+    networkAccess: true
+  LoadListingRequirement:
+    loadListing: no_listing
+inputs:
+  message:    {type: string, inputBinding: {position: 1}}
+baseCommand: echo
+outputs: []
+"""
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "testdata/v1.1/conflict-wf.cwl",
+        "testdata/v1.1/listing_deep1-arr.cwl",
+        "testdata/v1.1/networkaccess.cwl",
+        "testdata/v1.2/tar-param.cwl",
+    ],
+)
+def test_fast_path_matches_full_upgrade(tmp_path: Path, source: str) -> None:
+    """The text level cwlVersion edit gives the same document as the full upgrade."""
+    assert needs_only_version_bump(load_cwl_document(get_data(source)), "latest")
+    main([f"--dir={tmp_path}", get_data(source)])
+    expected = upgrade_document(load_cwl_document(get_data(source)), str(tmp_path))
+    result = load_cwl_document(str(tmp_path / Path(source).name))
+    assert snapshot(result) == snapshot(expected)
+
+
+def test_fast_path_keeps_formatting(tmp_path: Path) -> None:
+    """Only the cwlVersion line of an idiomatic v1.0 tool is changed."""
+    source = tmp_path / "source" / "tool.cwl"
+    source.parent.mkdir()
+    source.write_text(V1_0_IDIOMATIC_TOOL)
+    assert needs_only_version_bump(load_cwl_document(str(source)), "v1.1")
+    main([f"--dir={tmp_path}", "--v1.1-only", str(source)])
+    assert (tmp_path / "tool.cwl").read_text() == V1_0_IDIOMATIC_TOOL.replace(
+        "cwlVersion: v1.0", "cwlVersion: v1.1"
+    )
+
+
+def test_fast_path_not_taken(tmp_path: Path) -> None:
+    """Documents that need more than a new cwlVersion are fully upgraded."""
+    source = get_data("testdata/v1.0/listing_deep1.cwl")
+    assert not needs_only_version_bump(load_cwl_document(source), "v1.1")
+    main([f"--dir={tmp_path}", "--v1.1-only", source])
+    expected = load_cwl_document(get_data("testdata/v1.1/listing_deep1.cwl"))
+    assert load_cwl_document(str(tmp_path / "listing_deep1.cwl")) == expected
+
+
+def test_full_rewrite(tmp_path: Path) -> None:
+    """--full-rewrite re-serializes even if only the cwlVersion changes."""
+    source = get_path("testdata/v1.1/networkaccess.cwl")
+    main([f"--dir={tmp_path}", "--full-rewrite", str(source)])
+    result = (tmp_path / "networkaccess.cwl").read_text()
+    assert "cwlVersion: v1.2" in result
+    assert result != "#!/usr/bin/env cwl-runner\n" + source.read_text().replace(
+        "cwlVersion: v1.1", "cwlVersion: v1.2"
+    )
@@ -0,0 +1,85 @@
+"""Tests for the supervised upgrade of each document in its own worker."""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.isolate import Supervisor
+from cwlupgrader.main import Upgrader, main
+
+from .util import get_data
+
+CYCLE = """cwlVersion: v1.0
+class: Workflow
+inputs: []
+outputs: []
+steps:
+  step:
+    run: {run}
+    in: []
+    out: []
+"""
+
+
+def write_cycle(directory: Path) -> Path:
+    """Write two workflows running each other."""
+    (directory / "first.cwl").write_text(CYCLE.format(run="second.cwl"))
+    (directory / "second.cwl").write_text(CYCLE.format(run="first.cwl"))
+    return directory / "first.cwl"
+
+
+def write_large(directory: Path, items: int) -> Path:
+    """Write a tool with a huge default value, that is slow to upgrade."""
+    path = directory / "large.cwl"
+    with path.open("w") as handle:
+        handle.write(
+            "cwlVersion: v1.0\nclass: CommandLineTool\nbaseCommand: echo\n"
+            "outputs: []\ninputs:\n  large:\n    type: Any\n    default:\n"
+        )
+        for index in range(items):
+            handle.write(f"      - item{index}: {{value: {index}, list: [a, b]}}\n")
+    return path
+
+
+def test_run_cycle(tmp_path: Path) -> None:
+    """A cycle of 'run:' references is reported instead of recursing."""
+    first = write_cycle(tmp_path)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    with pytest.raises(Exception, match="Cycle in 'run:' references"):
+        Upgrader(str(out_dir)).upgrade_file(str(first))
+
+
+def test_supervisor(tmp_path: Path) -> None:
+    """Failing and too expensive documents don't stop the others."""
+    first = write_cycle(tmp_path)
+    large = write_large(tmp_path, 200000)
+    tool = tmp_path / "networkaccess.cwl"
+    shutil.copy(get_data("testdata/v1.0/networkaccess.cwl"), tool)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    upgrader = Upgrader(str(out_dir))
+    supervisor = Supervisor(upgrader, jobs=2, cpu_limit=1)
+    supervisor.run([str(first), str(large), str(tool)])
+    assert set(supervisor.failures) == {str(first), str(large)}
+    assert "Cycle in 'run:' references" in supervisor.failures[str(first)]
+    assert "SIGXCPU" in supervisor.failures[str(large)]
+    assert upgrader.written == [str(out_dir / "networkaccess.cwl")]
+    reference = tmp_path / "reference"
+    reference.mkdir()
+    Upgrader(str(reference)).upgrade_file(str(tool))
+    assert (out_dir / "networkaccess.cwl").read_text() == (
+        reference / "networkaccess.cwl"
+    ).read_text()
+
+
+def test_isolate_cli(tmp_path: Path) -> None:
+    """The command line fails if any document failed in its worker."""
+    first = write_cycle(tmp_path)
+    out_dir = tmp_path / "out"
+    tool = get_data("testdata/v1.0/listing_deep1.cwl")
+    assert main(["--isolate", f"--dir={out_dir}", str(first), tool]) == 1
+    assert (out_dir / "listing_deep1.cwl").exists()
+    assert main(["--isolate", f"--dir={out_dir}", tool]) == 0
+    assert main(["--memory-limit=100", f"--dir={out_dir}", "-"]) == 1
@@ -0,0 +1,74 @@
+"""Tests for upgrading CWL documents written in JSON."""
+
+import json
+import shutil
+import stat
+from pathlib import Path
+
+from ruamel.yaml import YAML
+
+from cwlupgrader.main import Upgrader, main
+
+from .util import get_data
+
+
+def to_json(source: str, destination: Path) -> None:
+    """Convert a YAML CWL document to JSON."""
+    loader = YAML(typ="safe", pure=True)
+    destination.write_text(
+        json.dumps(loader.load(Path(get_data(source)).read_text()), indent=2)
+    )
+
+
+def test_json_workflow(tmp_path: Path) -> None:
+    """JSON documents and their 'run:' documents are upgraded to JSON."""
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    to_json("testdata/v1.0/1st-workflow.cwl", sources / "1st-workflow.json")
+    for name in ("arguments", "tar-param"):
+        to_json(f"testdata/v1.0/{name}.cwl", sources / f"{name}.cwl")
+    out_dir = tmp_path / "out"
+    main([f"--dir={out_dir}", str(sources / "1st-workflow.json")])
+
+    loader = YAML(typ="safe", pure=True)
+    for name, expected in [
+        ("1st-workflow.json", "1st-workflow.cwl"),
+        ("arguments.cwl", "arguments.cwl"),
+        ("tar-param.cwl", "tar-param.cwl"),
+    ]:
+        output = out_dir / name
+        upgraded = json.loads(output.read_text())
+        reference = loader.load(Path(get_data(f"testdata/v1.2/{expected}")))
+        assert json.dumps(upgraded) == json.dumps(reference)
+        assert not output.stat().st_mode & stat.S_IXUSR
+
+
+def test_packed_json(tmp_path: Path) -> None:
+    """A packed document in JSON, with '$graph', keeps its JSON formatting."""
+    source = tmp_path / "packed.cwl"
+    to_json("testdata/v1.0/conflict-wf.cwl", source)
+    out_dir = tmp_path / "out"
+    main([f"--dir={out_dir}", str(source)])
+    output = (out_dir / "packed.cwl").read_text()
+    assert output.startswith("{\n    ")
+    assert json.loads(output)["cwlVersion"] == "v1.2"
+
+
+def test_json_by_source(tmp_path: Path) -> None:
+    """Only the documents loaded from JSON are written as JSON."""
+    for directory in ("json", "yaml", "out"):
+        (tmp_path / directory).mkdir()
+    to_json("testdata/v1.0/networkaccess.cwl", tmp_path / "json" / "tool.cwl")
+    to_json("testdata/v1.0/arguments.cwl", tmp_path / "json" / "arguments.cwl")
+    shutil.copy(get_data("testdata/v1.0/1st-workflow.cwl"), tmp_path / "yaml/tool.cwl")
+    shutil.copy(get_data("testdata/v1.0/tar-param.cwl"), tmp_path / "yaml")
+    shutil.copy(get_data("testdata/v1.0/arguments.cwl"), tmp_path / "yaml")
+    upgrader = Upgrader(str(tmp_path / "out"))
+    upgrader.upgrade_file(str(tmp_path / "json" / "tool.cwl"))
+    assert (tmp_path / "out" / "tool.cwl").read_text().startswith("{")
+    upgrader.upgrade_file(str(tmp_path / "json" / "arguments.cwl"))
+    upgrader.upgrade_file(str(tmp_path / "yaml" / "tool.cwl"))
+    output = (tmp_path / "out" / "tool.cwl").read_text()
+    assert output.startswith("#!/usr/bin/env cwl-runner\ncwlVersion: v1.2\n")
+    # a 'run:' document with the same name as a JSON document is still YAML
+    assert not (tmp_path / "out" / "arguments.cwl").read_text().startswith("{")
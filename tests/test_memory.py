@@ -0,0 +1,81 @@
+"""Memory accounting, and benchmarks of the peak memory per MB of input."""
+
+import json
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from ruamel.yaml import YAML
+
+from cwlupgrader.main import Upgrader, main
+from cwlupgrader.memory import MEGABYTE, MemoryReport
+
+from .util import (
+    generate_draft3_workflow,
+    generate_v1_0_nested_workflow,
+    generate_v1_0_tool,
+    generate_v1_0_workflow,
+    get_data,
+)
+
+
+def test_memory_report(tmp_path: Path) -> None:
+    """Each document gets its peak and retained memory, in total and per phase."""
+    report_file = tmp_path / "memory.json"
+    main(
+        [
+            f"--dir={tmp_path}",
+            f"--memory-report={report_file}",
+            get_data("testdata/v1.0/1st-workflow.cwl"),
+            get_data("testdata/v1.1/listing_deep1.cwl"),
+        ]
+    )
+    report = json.loads(report_file.read_text())
+    assert [Path(entry["path"]).name for entry in report["documents"]] == [
+        "1st-workflow.cwl",
+        "listing_deep1.cwl",
+    ]
+    for entry in report["documents"]:
+        assert entry["size"] > 0
+        assert set(entry["phases"]) == {"load", "upgrade", "serialize", "write"}
+        assert entry["peak"] >= max(phase["peak"] for phase in entry["phases"].values())
+    assert report["peak"] == max(entry["peak"] for entry in report["documents"])
+
+
+@pytest.mark.parametrize(
+    ("generator", "size", "target", "budget"),
+    [
+        # budgets in MiB of peak traced memory per MB of input,
+        # about 1.5 times the measured values
+        pytest.param(generate_v1_0_workflow, 50, "latest", 240, id="steps"),
+        pytest.param(generate_v1_0_tool, 250, "latest", 190, id="inputs"),
+        pytest.param(generate_v1_0_nested_workflow, 32, "latest", 33, id="depth"),
+        pytest.param(generate_draft3_workflow, 100, "v1.0", 210, id="draft3"),
+    ],
+)
+def test_peak_memory_per_megabyte(
+    tmp_path: Path,
+    generator: Callable[[int], dict[str, Any]],
+    size: int,
+    target: str,
+    budget: int,
+) -> None:
+    """Peak memory stays within a fixed multiple of the input size."""
+    source = tmp_path / "generated.cwl"
+    dumper = YAML(typ="safe", pure=True)
+    dumper.default_flow_style = False
+    with source.open("w") as handle:
+        dumper.dump(generator(size), handle)
+    report = MemoryReport()
+    upgrader = Upgrader(str(tmp_path), target, memory=report, sink=lambda *output: None)
+    try:
+        upgrader.upgrade_file(str(source))
+    finally:
+        report.stop()
+    (entry,) = report.documents
+    per_megabyte = entry.peak_per_megabyte() / MEGABYTE
+    assert per_megabyte < budget, (
+        f"{per_megabyte:.0f} MiB per MB of input, "
+        f"phases: {[(name, phase.peak) for name, phase in entry.phases.items()]}"
+    )
@@ -0,0 +1,48 @@
+"""Tests for the --metrics option."""
+
+import json
+from pathlib import Path
+
+from cwlupgrader.main import main
+
+from .util import get_data
+
+
+def test_metrics_json(tmp_path: Path) -> None:
+    """Rule counters are collected across all the documents."""
+    metrics_file = tmp_path / "metrics.json"
+    main(
+        [
+            f"--dir={tmp_path}",
+            f"--metrics={metrics_file}",
+            "--v1-only",
+            get_data("testdata/draft-3/wf.cwl"),
+            get_data("testdata/draft-3/attributor-prok-cheetah.cwl"),
+        ]
+    )
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["documents"] == 2
+    rules = metrics["rules"]
+    assert rules["workflow_clean"]["calls"] == 1
+    assert rules["workflow_clean"]["nodes"] == 2
+    assert rules["input_output_clean"]["calls"] == 2
+    assert rules["hints_and_requirements_clean"]["nodes"] == 4
+    assert rules["draft3_to_v1_0"]["seconds"] > 0
+    assert "network_access_injection" not in rules
+
+
+def test_metrics_prometheus(tmp_path: Path) -> None:
+    """The Prometheus textfile format is available too."""
+    metrics_file = tmp_path / "cwl_upgrader.prom"
+    main(
+        [
+            f"--dir={tmp_path}",
+            f"--metrics={metrics_file}",
+            "--metrics-format=prometheus",
+            get_data("testdata/v1.0/listing_deep1.cwl"),
+        ]
+    )
+    lines = metrics_file.read_text().splitlines()
+    assert "cwl_upgrader_documents_total 1" in lines
+    assert 'cwl_upgrader_rule_fired_total{rule="network_access_injection"} 1' in lines
+    assert "# TYPE cwl_upgrader_rule_seconds_total counter" in lines
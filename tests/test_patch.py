@@ -0,0 +1,76 @@
+"""Tests for the --patch output mode."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from cwlupgrader.main import load_cwl_document, main
+from cwlupgrader.patch import make_patch, snapshot
+
+from .util import get_data
+
+
+def apply_patch(document: Any, patch: list[dict[str, Any]]) -> Any:
+    """Minimal RFC 6902 implementation covering the operations we emit."""
+
+    def locate(path: str) -> tuple[Any, str]:
+        tokens = [
+            token.replace("~1", "/").replace("~0", "~") for token in path.split("/")[1:]
+        ]
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token) if isinstance(parent, list) else token]
+        return parent, tokens[-1]
+
+    def take(path: str) -> Any:
+        parent, key = locate(path)
+        if isinstance(parent, list):
+            return parent.pop(int(key))
+        return parent.pop(key)
+
+    def put(path: str, value: Any) -> None:
+        parent, key = locate(path)
+        if isinstance(parent, list):
+            if key == "-":
+                parent.append(value)
+            else:
+                parent.insert(int(key), value)
+        else:
+            parent[key] = value
+
+    for operation in patch:
+        match operation["op"]:
+            case "remove":
+                take(operation["path"])
+            case "add":
+                put(operation["path"], operation["value"])
+            case "replace":
+                if operation["path"] == "":
+                    document = operation["value"]
+                else:
+                    take(operation["path"])
+                    put(operation["path"], operation["value"])
+            case "move":
+                put(operation["path"], take(operation["from"]))
+    return document
+
+
+def test_patch_draft3_workflow(tmp_path: Path) -> None:
+    """Applying the emitted patch reproduces the full upgrade."""
+    source = get_data("testdata/draft-3/wf.cwl")
+    main([f"--dir={tmp_path}", "--v1-only", "--patch", source])
+    assert not (tmp_path / "wf.cwl").exists()
+    patch = json.loads((tmp_path / "wf.cwl.patch.json").read_text())
+    patched = apply_patch(snapshot(load_cwl_document(source)), patch)
+    expected = snapshot(load_cwl_document(get_data("testdata/v1.0/wf.cwl")))
+    assert patched == expected
+
+
+def test_patch_is_minimal() -> None:
+    """Renames become moves and re-ordering is not an edit."""
+    before = {"b": 1, "description": "text", "c": [1, 2]}
+    after = {"doc": "text", "c": [1, 2, 3], "b": 1}
+    assert make_patch(before, after) == [
+        {"op": "add", "path": "/c/-", "value": 3},
+        {"op": "move", "from": "/description", "path": "/doc"},
+    ]
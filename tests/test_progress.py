@@ -0,0 +1,62 @@
+"""Tests for the progress and throughput reports."""
+
+import io
+import json
+from pathlib import Path
+
+from cwlupgrader.main import main
+from cwlupgrader.progress import Progress, StatusStream, format_duration
+
+from .util import get_data
+
+
+def test_progress(tmp_path: Path) -> None:
+    """The counters, rates and estimates follow the documents."""
+    paths = []
+    for index, size in enumerate((100, 300, 600)):
+        path = tmp_path / f"document{index}.cwl"
+        path.write_text("x" * size)
+        paths.append(str(path))
+    terminal = io.StringIO()
+    status = StatusStream(terminal)
+    progress = Progress(paths, status, interval=60)
+    with progress:
+        progress.start(paths[0])
+        progress.finish(paths[0])
+        progress.start(paths[1])
+        snapshot = progress.snapshot()
+        assert snapshot["files_done"] == 1
+        assert snapshot["bytes_done"] == 100
+        assert snapshot["bytes_total"] == 1000
+        assert snapshot["queue"] == 1
+        assert [entry["path"] for entry in snapshot["in_flight"]] == [paths[1]]
+        assert snapshot["eta"] is not None and snapshot["eta"] > 0
+        assert Progress.render(snapshot).startswith("1/3 files (33.3%), ")
+        assert f" - {paths[1]} (0s)" in Progress.render(snapshot)
+        progress.report()
+        status.write("a log line\n")
+        progress.finish(paths[1], failed=True)
+        progress.start(paths[2])
+        progress.finish(paths[2])
+    output = terminal.getvalue()
+    assert "\r\x1b[Ka log line\n1/3 files" in output
+    assert "3/3 files (100.0%)" in output and ", 1 failed, ETA 0s" in output
+    assert output.endswith("\n")
+    assert format_duration(3723) == "1h02m03s"
+
+
+def test_progress_file(tmp_path: Path) -> None:
+    """The progress is appended to a file as JSON lines."""
+    report = tmp_path / "progress.jsonl"
+    inputs = [
+        get_data(f"testdata/v1.0/{name}")
+        for name in ("listing_deep1.cwl", "networkaccess.cwl", "arguments.cwl")
+    ]
+    assert (
+        main([f"--dir={tmp_path}", f"--progress-file={report}", "--isolate", *inputs])
+        == 0
+    )
+    lines = [json.loads(line) for line in report.read_text().splitlines()]
+    assert lines[0]["files_done"] == 0
+    assert lines[-1]["files_done"] == lines[-1]["files_total"] == 3
+    assert lines[-1]["queue"] == 0 and lines[-1]["in_flight"] == []
@@ -0,0 +1,114 @@
+"""Tests for the --shard and --merge-manifests options."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.main import main
+from cwlupgrader.shard import STEP_COST, plan_shards
+
+from .util import get_data
+
+INPUTS = [
+    get_data("testdata/v1.0/1st-workflow.cwl"),
+    get_data("testdata/v1.0/arguments.cwl"),
+    get_data("testdata/v1.0/tar-param.cwl"),
+    get_data("testdata/v1.0/networkaccess.cwl"),
+    get_data("testdata/v1.0/listing_deep1.cwl"),
+    get_data("testdata/v1.0/conflict-wf.cwl"),
+    get_data("testdata/v1.0/wf.cwl"),
+    get_data("testdata/draft-3/wf.cwl"),
+]
+
+# testdata/v1.0/wf.cwl references documents that are not in the repository,
+# and draft-3 workflows can't be upgraded past v1.0 yet
+RUNNABLE = INPUTS[:6]
+
+
+def shard_of(shards: list[list[str]], path: str) -> int:
+    """Find the shard containing a given input."""
+    return next(index for index, shard in enumerate(shards) if path in shard)
+
+
+def test_plan_keeps_groups_together() -> None:
+    """Referenced documents, and documents with the same name, share a shard."""
+    shards = plan_shards(INPUTS, 3)
+    assert sorted(path for shard in shards for path in shard) == sorted(INPUTS)
+    assert all(shards)
+    workflow = shard_of(shards, INPUTS[0])
+    assert shard_of(shards, INPUTS[1]) == workflow
+    assert shard_of(shards, INPUTS[2]) == workflow
+    assert shard_of(shards, INPUTS[6]) == shard_of(shards, INPUTS[7])
+    reordered = plan_shards(list(reversed(INPUTS)), 3)
+    assert [set(shard) for shard in reordered] == [set(shard) for shard in shards]
+
+
+def test_plan_balances_cost(tmp_path: Path) -> None:
+    """The largest groups are spread first, steps counting towards the cost."""
+    inputs = []
+    for name, size in [("a", 100), ("b", 300), ("c", 200), ("d", 250)]:
+        path = tmp_path / f"{name}.cwl"
+        path.write_text("class: CommandLineTool\n" + "#" * size + "\n")
+        inputs.append(str(path))
+    workflow = tmp_path / "wf.cwl"
+    workflow.write_text("class: Workflow\nsteps:\n  s1:\n    run: '#a'\n")
+    inputs.append(str(workflow))
+    assert STEP_COST > 300
+    assert plan_shards(inputs, 2) == [
+        [str(workflow)],
+        [str(tmp_path / name) for name in ("a.cwl", "b.cwl", "c.cwl", "d.cwl")],
+    ]
+    assert plan_shards(inputs, 3) == [
+        [str(workflow)],
+        [str(tmp_path / name) for name in ("a.cwl", "b.cwl")],
+        [str(tmp_path / name) for name in ("c.cwl", "d.cwl")],
+    ]
+
+
+def test_sharded_run_and_merge(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """The manifests of all the shards merge into a complete report."""
+    manifests = []
+    for shard in (1, 2):
+        out_dir = tmp_path / str(shard)
+        assert main([f"--dir={out_dir}", f"--shard={shard}/2", *RUNNABLE]) == 0
+        manifests.append(str(out_dir / f"shard-{shard}-of-2.json"))
+    first = json.loads(Path(manifests[0]).read_text())
+    assert first["shard"] == 1
+    assert first["shards"] == 2
+    assert {"1st-workflow.cwl", "arguments.cwl", "tar-param.cwl"} <= set(
+        first["outputs"]
+    ) | set(json.loads(Path(manifests[1]).read_text())["outputs"])
+    capsys.readouterr()
+
+    assert main(["--merge-manifests", *manifests]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert sorted(report["inputs"]) == sorted(RUNNABLE)
+    assert report["missing_shards"] == []
+    assert report["conflicts"] == {}
+
+    assert main(["--merge-manifests", manifests[0]]) == 1
+    assert json.loads(capsys.readouterr().out)["missing_shards"] == [2]
+    assert main(["--merge-manifests", manifests[0], manifests[0]]) == 1
+
+
+def test_sharded_failure(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """A document that failed in a worker fails the merged report."""
+    broken = get_data("testdata/v1.0/wf.cwl")
+    inputs = [*RUNNABLE, broken]
+    failing = shard_of(plan_shards(inputs, 2), broken) + 1
+    manifests = []
+    for shard in (1, 2):
+        out_dir = tmp_path / str(shard)
+        status = main([f"--dir={out_dir}", f"--shard={shard}/2", "--isolate", *inputs])
+        assert status == (1 if shard == failing else 0)
+        manifests.append(str(out_dir / f"shard-{shard}-of-2.json"))
+    capsys.readouterr()
+
+    assert main(["--merge-manifests", *manifests]) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert list(report["failed"]) == [broken]
+    assert "md5.cwl" in report["failed"][broken]
+    assert report["missing_shards"] == [] and report["conflicts"] == {}
@@ -0,0 +1,103 @@
+"""Tests for reading from the standard input and writing to the standard output."""
+
+import io
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.main import main
+
+from .util import get_data
+
+
+def test_stdin_to_stdout(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """The upgraded document goes to stdout, its 'run:' documents to --dir."""
+    source = Path(get_data("testdata/v1.0/1st-workflow.cwl"))
+    monkeypatch.setattr("sys.stdin", io.StringIO(source.read_text()))
+    assert main([f"--dir={tmp_path}", f"--base-dir={source.parent}", "-"]) == 0
+    assert (
+        capsys.readouterr().out
+        == Path(get_data("testdata/v1.2/1st-workflow.cwl")).read_text()
+    )
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "arguments.cwl",
+        "tar-param.cwl",
+    ]
+
+
+def test_inline(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """With --inline, the upgraded 'run:' and '$import' documents are embedded."""
+    (tmp_path / "types.yml").write_text(
+        "- name: Color\n  type: enum\n  symbols: [red]\n"
+    )
+    (tmp_path / "tool.cwl").write_text("""cwlVersion: v1.1
+class: CommandLineTool
+inputs: []
+outputs: []
+baseCommand: "true"
+""")
+    source = """cwlVersion: v1.1
+class: Workflow
+requirements:
+  SchemaDefRequirement:
+    types:
+      $import: types.yml
+inputs: []
+outputs: []
+steps:
+  step:
+    run: tool.cwl
+    in: []
+    out: []
+"""
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    monkeypatch.setattr("sys.stdin", io.StringIO(source))
+    assert main([f"--dir={out_dir}", f"--base-dir={tmp_path}", "--inline", "-"]) == 0
+    output = capsys.readouterr().out
+    assert "run:\n      class: CommandLineTool\n" in output
+    assert "types:\n    - name: Color\n" in output
+    assert output.count("cwlVersion") == 1
+    assert "$import" not in output
+    assert not list(out_dir.iterdir())
+
+
+def test_single_stdin() -> None:
+    """The standard input can't be read twice."""
+    assert main(["-", "-"]) == 1
+
+
+@pytest.mark.parametrize(
+    "args, text",
+    [
+        (
+            ["--v1.1-only"],
+            Path(get_data("testdata/v1.1/networkaccess.cwl")).read_text(),
+        ),
+        (["--v1-only"], Path(get_data("testdata/v1.1/networkaccess.cwl")).read_text()),
+        (
+            ["--always-write", "--full-rewrite"],
+            Path(get_data("testdata/v1.2/networkaccess.cwl")).read_text(),
+        ),
+        ([], "- name: Color\n  type: enum\n  symbols: [red]\n"),
+    ],
+)
+def test_stdin_pass_through(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    args: list[str],
+    text: str,
+) -> None:
+    """A document from stdin that is not upgraded goes to stdout unchanged."""
+    monkeypatch.setattr("sys.stdin", io.StringIO(text))
+    assert main([f"--dir={tmp_path}", *args, "-"]) == 0
+    assert capsys.readouterr().out == text
@@ -0,0 +1,130 @@
+"""Tests for the content-addressed output store."""
+
+import os
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cwlupgrader.main import Upgrader, main
+from cwlupgrader.store import OutputStore, replace_file
+
+from .util import get_data
+
+
+def vendor(tmp_path: Path, projects: int, *names: str) -> list[Path]:
+    """Copy the same v1.0 documents into several project directories."""
+    directories = []
+    for index in range(projects):
+        directory = tmp_path / f"project{index}"
+        directory.mkdir()
+        for name in names:
+            shutil.copy(get_data(f"testdata/v1.0/{name}"), directory)
+        directories.append(directory)
+    return directories
+
+
+def test_store_standalone(tmp_path: Path) -> None:
+    """Identical tools are upgraded once, and their outputs hard linked."""
+    projects = vendor(tmp_path, 3, "networkaccess.cwl")
+    store = OutputStore(str(tmp_path / "store"))
+    for project in projects:
+        Upgrader(str(project), store=store).upgrade_file(
+            str(project / "networkaccess.cwl")
+        )
+    assert store.hits == 2
+    outputs = [project / "networkaccess.cwl" for project in projects]
+    assert len({output.stat().st_ino for output in outputs}) == 1
+    assert outputs[0].stat().st_nlink == 4
+    assert os.access(outputs[0], os.X_OK)
+    reference = tmp_path / "reference"
+    reference.mkdir()
+    Upgrader(str(reference)).upgrade_file(get_data("testdata/v1.0/networkaccess.cwl"))
+    assert outputs[0].read_text() == (reference / "networkaccess.cwl").read_text()
+
+    (blob,) = (path for path in store.blobs.rglob("*") if path.is_file())
+    assert not blob.stat().st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+    # the outputs are read-only: replace one with another source, and upgrade
+    # it without the store, which must not write through the link either
+    edited = projects[0] / "networkaccess.cwl"
+    edited.unlink()
+    shutil.copy(get_data("testdata/v1.0/networkaccess.cwl"), edited)
+    edited.write_text(edited.read_text() + "# edited\n")
+    Upgrader(str(projects[0])).upgrade_file(str(edited))
+    assert "# edited" in edited.read_text()
+    assert edited.stat().st_ino != outputs[1].stat().st_ino
+    upgraded = (reference / "networkaccess.cwl").read_text()
+    assert outputs[1].read_text() == upgraded
+    assert blob.read_text() == upgraded
+    Upgrader(str(projects[0]), store=store).upgrade_file(str(edited))
+    assert store.hits == 2
+    assert edited.stat().st_ino != outputs[1].stat().st_ino
+
+    # a blob written through a link anyway is not reused, but stored again
+    outputs[2].chmod(0o644)
+    outputs[2].write_text(Path(get_data("testdata/v1.0/networkaccess.cwl")).read_text())
+    (tmp_path / "late").mkdir()
+    (project,) = vendor(tmp_path / "late", 1, "networkaccess.cwl")
+    Upgrader(str(project), store=store).upgrade_file(str(project / "networkaccess.cwl"))
+    assert store.hits == 2
+    assert (project / "networkaccess.cwl").read_text() == upgraded
+    assert store.get(store.put(upgraded, True)) == (upgraded, True)
+
+
+def test_store_workflow(tmp_path: Path) -> None:
+    """Workflows are always upgraded, but their outputs are still shared."""
+    projects = vendor(tmp_path, 2, "1st-workflow.cwl", "arguments.cwl", "tar-param.cwl")
+    out_dirs = [project / "out" for project in projects]
+    for project, out_dir in zip(projects, out_dirs):
+        main(
+            [
+                f"--store={tmp_path / 'store'}",
+                f"--dir={out_dir}",
+                str(project / "1st-workflow.cwl"),
+            ]
+        )
+    assert not list((tmp_path / "store" / "index").iterdir())
+    for name in ("1st-workflow.cwl", "arguments.cwl", "tar-param.cwl"):
+        first, second = (out_dir / name for out_dir in out_dirs)
+        assert first.stat().st_ino == second.stat().st_ino
+        assert first.read_text() == Path(get_data(f"testdata/v1.2/{name}")).read_text()
+
+
+def test_store_import(tmp_path: Path) -> None:
+    """Documents with an '$import' are not reused, even once it was upgraded."""
+    (tmp_path / "types.yml").write_text(
+        "class: SchemaDefRequirement\n"
+        "types:\n  - name: thing\n    type: enum\n    symbols: [a, b]\n"
+    )
+    for name in ("first", "second"):
+        (tmp_path / f"{name}.cwl").write_text(
+            "cwlVersion: v1.0\nclass: CommandLineTool\n"
+            "requirements:\n  - $import: types.yml\n"
+            f"baseCommand: echo\ninputs:\n  {name}: string\noutputs: []\n"
+        )
+    store = f"--store={tmp_path / 'store'}"
+    sources = [str(tmp_path / "first.cwl"), str(tmp_path / "second.cwl")]
+    assert main([store, f"--dir={tmp_path / 'out1'}", *sources]) == 0
+    assert main([store, f"--dir={tmp_path / 'out2'}", sources[1]]) == 0
+    assert (tmp_path / "out2" / "types.yml").exists()
+    assert not list((tmp_path / "store" / "index").iterdir())
+
+
+def test_replace_file(tmp_path: Path) -> None:
+    """Concurrent replacements don't share a temporary file or break links."""
+    target = tmp_path / "report.json"
+    target.write_text("old\n")
+    link = tmp_path / "link.json"
+    os.link(target, link)
+    contents = [f"{index}\n" * 10000 for index in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda content: replace_file(target, content), contents))
+    assert target.read_text() in contents
+    assert link.read_text() == "old\n"
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "link.json",
+        "report.json",
+    ]
+    replace_file(target, "#!/usr/bin/env cwl-runner\n", executable=True)
+    assert target.stat().st_mode & stat.S_IXUSR
@@ -0,0 +1,73 @@
+"""Tests for the reentrant Upgrader object."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cwlupgrader.main import (
+    Upgrader,
+    _default_upgrader,
+    load_cwl_document,
+    upgrade_document,
+    write_cwl_document,
+)
+
+from .util import get_data
+
+SOURCES = {
+    "v1.0": ["testdata/draft-3/wf.cwl", "testdata/draft-3/attributor-prok-cheetah.cwl"],
+    "latest": [
+        "testdata/v1.0/1st-workflow.cwl",
+        "testdata/v1.0/conflict-wf.cwl",
+        "testdata/v1.0/listing_deep1-arr.cwl",
+        "testdata/v1.0/networkaccess.cwl",
+        "testdata/v1.1/listing_deep1.cwl",
+    ],
+}
+
+
+def upgrade_in_memory(target_version: str, out_dir: str) -> dict[str, str]:
+    """Upgrade all the sources for one target, collecting the outputs."""
+    outputs: dict[str, str] = {}
+
+    def sink(path: Path, content: str, executable: bool) -> None:
+        outputs[path.name] = content
+
+    upgrader = Upgrader(out_dir, target_version, sink=sink)
+    for source in SOURCES[target_version]:
+        upgrader.upgrade_file(get_data(source))
+    return outputs
+
+
+def test_in_memory_sink(tmp_path: Path) -> None:
+    """Referenced 'run:' documents also go to the sink, and nothing to disk."""
+    outputs = upgrade_in_memory("latest", str(tmp_path))
+    assert {"1st-workflow.cwl", "arguments.cwl", "tar-param.cwl"} <= set(outputs)
+    assert (
+        outputs["arguments.cwl"]
+        == Path(get_data("testdata/v1.2/arguments.cwl")).read_text()
+    )
+    assert not list(tmp_path.iterdir())
+
+
+def test_concurrent_upgraders(tmp_path: Path) -> None:
+    """Separate instances in parallel threads give the same results as in serial."""
+    expected = {target: upgrade_in_memory(target, str(tmp_path)) for target in SOURCES}
+    targets = list(SOURCES) * 16
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda target: upgrade_in_memory(target, str(tmp_path)), targets
+            )
+        )
+    for target, outputs in zip(targets, results):
+        assert outputs == expected[target]
+
+
+def test_module_functions_keep_no_state(tmp_path: Path) -> None:
+    """The module level functions don't accumulate the outputs they write."""
+    for _ in range(5):
+        document = load_cwl_document(get_data("testdata/v1.0/1st-workflow.cwl"))
+        upgraded = upgrade_document(document, str(tmp_path), "v1.1")
+        write_cwl_document(upgraded, "1st-workflow.cwl", str(tmp_path))
+    assert _default_upgrader.written == []
+    assert not _default_upgrader._writes
@@ -0,0 +1,95 @@
+"""Tests for the --validate option."""
+
+import filecmp
+from pathlib import Path
+
+import pytest
+
+from cwlupgrader.main import main
+
+from .util import get_data, get_path
+
+pytest.importorskip("cwl_utils")
+
+from cwlupgrader.validate import load_schema  # noqa: E402
+
+
+def test_validate_draft3_workflow(tmp_path: Path) -> None:
+    """A valid upgrade is still written when --validate is used."""
+    assert (
+        main(
+            [
+                f"--dir={tmp_path}",
+                "--v1-only",
+                "--validate",
+                get_data("testdata/draft-3/wf.cwl"),
+            ]
+        )
+        == 0
+    )
+    assert filecmp.cmp(get_path("testdata/v1.0/wf.cwl"), tmp_path / "wf.cwl")
+
+
+def test_validate_invalid_document(tmp_path: Path) -> None:
+    """Invalid upgraded documents are reported and not written."""
+    source = tmp_path / "source"
+    source.mkdir()
+    broken = source / "broken.cwl"
+    broken.write_text(
+        "cwlVersion: v1.1\n"
+        "class: CommandLineTool\n"
+        "inputs: 5\n"
+        "outputs: []\n"
+        "baseCommand: echo\n"
+    )
+    out_dir = tmp_path / "out"
+    args = [f"--dir={out_dir}", "--validate", str(broken)]
+    args.append(get_data("testdata/v1.1/networkaccess.cwl"))
+    assert main(args) == 1
+    assert not (out_dir / "broken.cwl").exists()
+    assert (out_dir / "networkaccess.cwl").exists()
+
+
+def test_validate_schema_cache(tmp_path: Path) -> None:
+    """Each schema is only loaded once per process."""
+    load_schema.cache_clear()
+    main(
+        [
+            f"--dir={tmp_path}",
+            "--validate",
+            get_data("testdata/v1.1/listing_deep1.cwl"),
+            get_data("testdata/v1.1/networkaccess.cwl"),
+            get_data("testdata/v1.1/conflict-wf.cwl"),
+        ]
+    )
+    info = load_schema.cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
+
+
+def test_validate_run_document(tmp_path: Path) -> None:
+    """The upgraded 'run:' documents are validated before they are written."""
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "bad.cwl").write_text(
+        "cwlVersion: v1.1\n"
+        "class: CommandLineTool\n"
+        "inputs: 5\n"
+        "outputs: []\n"
+        "baseCommand: echo\n"
+    )
+    workflow = source / "workflow.cwl"
+    workflow.write_text(
+        "cwlVersion: v1.1\n"
+        "class: Workflow\n"
+        "inputs: []\n"
+        "outputs: []\n"
+        "steps:\n"
+        "  step:\n"
+        "    run: bad.cwl\n"
+        "    in: []\n"
+        "    out: []\n"
+    )
+    out_dir = tmp_path / "out"
+    assert main([f"--dir={out_dir}", "--validate", str(workflow)]) == 1
+    assert not (out_dir / "bad.cwl").exists()
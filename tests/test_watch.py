@@ -0,0 +1,77 @@
+"""Tests for the --watch mode."""
+
+import shutil
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cwlupgrader.main import Upgrader
+from cwlupgrader.watch import Watcher
+
+from .util import get_data
+
+
+def edit(path: Path, old: str, new: str) -> None:
+    """Change a file, making sure its size changes too."""
+    text = path.read_text()
+    assert old in text
+    path.write_text(text.replace(old, new) + "\n# edited\n")
+
+
+def test_watch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Only the changed inputs and their dependents are upgraded again."""
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for name in ("1st-workflow", "arguments", "tar-param", "networkaccess"):
+        shutil.copy(get_data(f"testdata/v1.0/{name}.cwl"), sources)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    inputs = [str(sources / "1st-workflow.cwl"), str(sources / "networkaccess.cwl")]
+    upgrader = Upgrader(str(out_dir), cache=True)
+    for path in inputs:
+        upgrader.upgrade_file(path)
+    assert upgrader.dependencies[inputs[0]] == {
+        str(sources / "arguments.cwl"),
+        str(sources / "tar-param.cwl"),
+    }
+    watcher = Watcher(upgrader, inputs)
+    assert watcher.poll() == []
+
+    parsed: list[str] = []
+    parse = upgrader.parse
+
+    def counting_parse(text: str, path: str) -> Any:
+        parsed.append(Path(path).name)
+        return parse(text, path)
+
+    monkeypatch.setattr(upgrader, "parse", counting_parse)
+
+    edit(sources / "arguments.cwl", "Java 9 compiler", "Java 11 compiler")
+    assert watcher.poll() == [inputs[0]]
+    assert "Java 11 compiler" in (out_dir / "arguments.cwl").read_text()
+    # the tool, and its intermediate v1.1 version, but nothing else
+    assert set(parsed) == {"arguments.cwl"}
+
+    parsed.clear()
+    edit(sources / "networkaccess.cwl", "baseCommand", "baseCommand")
+    assert watcher.poll() == [inputs[1]]
+    assert parsed == ["networkaccess.cwl"]
+    assert watcher.poll() == []
+
+
+def test_watch_in_place(tmp_path: Path) -> None:
+    """Upgrading in place doesn't trigger another upgrade."""
+    source = tmp_path / "networkaccess.cwl"
+    shutil.copy(get_data("testdata/v1.0/networkaccess.cwl"), source)
+    upgrader = Upgrader(str(tmp_path), cache=True)
+    upgrader.upgrade_file(str(source))
+    watcher = Watcher(upgrader, [str(source)])
+    edit(source, "v1.2", "v1.0")
+    assert watcher.poll() == [str(source)]
+    assert "cwlVersion: v1.2" in source.read_text()
+    assert watcher.poll() == []
+    stop = threading.Event()
+    stop.set()
+    watcher.run(stop=stop)
@@ -5,6 +5,7 @@ import os
 from contextlib import ExitStack
 from importlib.resources import as_file, files
 from pathlib import Path
+from typing import Any
 
 
 def get_path(filename: str) -> Path:
@@ -27,3 +28,76 @@ def get_path(filename: str) -> Path:
 def get_data(filename: str) -> str:
     """Get the filename as string for a given test file."""
     return str(get_path(filename))
+
+
+def _tool(inputs: int) -> dict[str, Any]:
+    """A CWL v1.0 CommandLineTool with the given number of inputs."""
+    return {
+        "class": "CommandLineTool",
+        "baseCommand": "echo",
+        "inputs": {
+            f"in{index}": {
+                "type": "File",
+                "inputBinding": {"position": index, "loadContents": True},
+            }
+            for index in range(inputs)
+        },
+        "outputs": {"out": {"type": "stdout"}},
+    }
+
+
+def generate_v1_0_tool(inputs: int) -> dict[str, Any]:
+    """Generate a CWL v1.0 CommandLineTool with many inputs."""
+    return {"cwlVersion": "v1.0", **_tool(inputs)}
+
+
+def generate_v1_0_workflow(steps: int) -> dict[str, Any]:
+    """Generate a CWL v1.0 Workflow with many steps, each with an embedded tool."""
+    return {
+        "cwlVersion": "v1.0",
+        "class": "Workflow",
+        "inputs": {"inp": "File"},
+        "outputs": [],
+        "steps": {
+            f"step{index}": {
+                "in": {"in0": "inp", "in1": "inp"},
+                "out": ["out"],
+                "run": _tool(2),
+            }
+            for index in range(steps)
+        },
+    }
+
+
+def generate_v1_0_nested_workflow(depth: int) -> dict[str, Any]:
+    """Generate a CWL v1.0 Workflow with embedded sub-workflows ``depth`` deep."""
+    process = _tool(1)
+    for level in range(depth):
+        process = {
+            "class": "Workflow",
+            "inputs": {"inp": "File"},
+            "outputs": [],
+            "steps": {
+                f"step{level}": {"in": {"in0": "inp"}, "out": [], "run": process}
+            },
+        }
+    return {"cwlVersion": "v1.0", **process}
+
+
+def generate_draft3_workflow(steps: int) -> dict[str, Any]:
+    """Generate a draft-3 Workflow with many steps."""
+    return {
+        "cwlVersion": "draft-3",
+        "class": "Workflow",
+        "inputs": [{"id": "#inp", "type": "File"}],
+        "outputs": [],
+        "steps": [
+            {
+                "id": f"#step{index}",
+                "run": "tool.cwl",
+                "inputs": [{"id": f"#step{index}.in0", "source": "#inp"}],
+                "outputs": [{"id": f"#step{index}.out"}],
+            }
+            for index in range(steps)
+        ],
+    }